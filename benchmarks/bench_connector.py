@@ -0,0 +1,288 @@
+# File: benchmarks/bench_connector.py
+#
+# Copyright (c) 2024-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+"""End-to-end benchmark of the connector actions against the local Databricks stand-in.
+
+Every action is driven through ``DatabricksConnector._handle_action`` exactly like the platform
+does, with the asset pointed at ``fake_databricks.FakeDatabricks``. For each action the p50/p99
+latency, the number of API requests and response bytes per run, and the peak Python memory of
+a run are reported. Needs the SOAR platform libraries (``phantom``) and the app dependencies.
+
+Example::
+
+    python benchmarks/bench_connector.py --iterations 50 --latency 0.02 --result-rows 100000
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Optional
+
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import phantom.app as phantom
+from fake_databricks import FakeDatabricks
+
+import databricks_connector
+
+
+WAREHOUSE_ID = "0000000000000001"
+
+QUERY_PARAM = {
+    "statement": "SELECT * FROM bench",
+    "warehouse_id": WAREHOUSE_ID,
+    "on_wait_timeout": "CANCEL",
+    "disposition": "INLINE",
+    "format": "JSON_ARRAY",
+}
+
+# Scenario name -> (action ID, action parameters). A parameter of None means the action needs a
+# statement ID, which is created right before the scenario runs.
+SCENARIOS = {
+    "test_connectivity": ("test_connectivity", {}),
+    "list_alerts": ("list_alerts", {}),
+    "list_alerts_filtered": ("list_alerts", {"state": "ok", "fields": "id,name,state", "limit": 10}),
+    "list_clusters": ("list_clusters", {}),
+    "list_warehouses": ("list_warehouses", {}),
+    "create_alert": (
+        "create_alert",
+        {"name": "bench", "query_id": "query-1", "column": "score", "operator": ">", "value": "0.5", "parent": "/Shared"},
+    ),
+    "perform_query": ("perform_query", dict(QUERY_PARAM, fetch_all_chunks=True)),
+    "perform_query_external_links": ("perform_query", dict(QUERY_PARAM, disposition="EXTERNAL_LINKS", fetch_all_chunks=True)),
+    "perform_query_poll": ("perform_query", dict(QUERY_PARAM, poll_until_complete=True)),
+    "perform_query_deduplicate": ("perform_query", dict(QUERY_PARAM, deduplicate=True)),
+    "perform_query_routed": (
+        "perform_query",
+        dict({key: value for key, value in QUERY_PARAM.items() if key != "warehouse_id"}, warehouse_tag="team=soc"),
+    ),
+    "perform_query_export_ndjson": ("perform_query", dict(QUERY_PARAM, export_format="NDJSON_GZ")),
+    "perform_query_export_parquet": ("perform_query", dict(QUERY_PARAM, export_format="PARQUET")),
+    "perform_query_parameterized": (
+        "perform_query",
+        dict(
+            QUERY_PARAM,
+            statement="SELECT * FROM trips WHERE fare > :min_fare LIMIT :limit",
+            parameters=json.dumps({"min_fare": 2.5, "limit": 100}),
+        ),
+    ),
+    "perform_batch_query": (
+        "perform_batch_query",
+        {"statements": json.dumps([f"SELECT {index}" for index in range(10)]), "warehouse_ids": WAREHOUSE_ID},
+    ),
+    "perform_batch_query_template": (
+        "perform_batch_query",
+        {
+            "statement_template": "SELECT * FROM events WHERE src_ip = :src_ip",
+            "parameter_sets": json.dumps([{"src_ip": f"10.0.0.{index}"} for index in range(10)]),
+            "warehouse_ids": WAREHOUSE_ID,
+        },
+    ),
+    "get_query_status": ("get_query_status", None),
+    "cancel_query": ("cancel_query", None),
+    "get_job_run": ("get_job_run", {"run_id": 1000}),
+    "get_job_run_bulk": ("get_job_run", {"run_ids": ",".join(str(run_id) for run_id in range(1000, 1100)), "fields": "state"}),
+    "get_job_output": ("get_job_output", {"run_id": 1000}),
+    "get_job_output_export": ("get_job_output", {"run_id": 1000, "export_format": "NDJSON_GZ"}),
+    "execute_notebook": ("execute_notebook", {"notebook_path": "/Shared/bench", "existing_cluster_id": "0517-000000-00000001"}),
+    "execute_notebook_no_wait": (
+        "execute_notebook",
+        {"notebook_path": "/Shared/bench", "existing_cluster_id": "0517-000000-00000001", "wait_for_completion": False},
+    ),
+    "wait_for_run": ("wait_for_run", {"run_id": 1000}),
+    "on_poll": ("on_poll", {}),
+    "on_poll_query_results": ("on_poll", {}),
+}
+
+# Scenario name -> asset configuration added to the defaults of run_action
+SCENARIO_CONFIG = {
+    "on_poll_query_results": {"poll_fetch_query_results": True},
+}
+
+
+class BenchmarkConnector(databricks_connector.DatabricksConnector):
+    """Connector that counts containers and vault files instead of sending them to the platform."""
+
+    saved_containers = 0
+    vault_files = 0
+
+    def save_container(self, container, fail_on_duplicate=False):
+        BenchmarkConnector.saved_containers += 1
+        return phantom.APP_SUCCESS, "Container saved", BenchmarkConnector.saved_containers
+
+    def save_containers(self, containers, fail_on_duplicate=False):
+        responses = []
+        for _ in containers:
+            BenchmarkConnector.saved_containers += 1
+            responses.append({"success": True, "id": BenchmarkConnector.saved_containers})
+        return phantom.APP_SUCCESS, "Containers saved", responses
+
+    def _create_vault_file(self, file_name):
+        fd, path = tempfile.mkstemp(suffix=f"_{file_name}")
+        os.close(fd)
+        return path
+
+    def _add_to_vault(self, path, file_name):
+        BenchmarkConnector.vault_files += 1
+        return f"bench-vault-{BenchmarkConnector.vault_files}"
+
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def run_action(fake: FakeDatabricks, action_id: str, param: dict, cold_client: bool, config: Optional[dict] = None) -> dict:
+    if cold_client:
+        databricks_connector._API_CLIENT_CACHE = databricks_connector.ApiClientCache()
+
+    in_json = {
+        "action": action_id.replace("_", " "),
+        "identifier": action_id,
+        "asset_id": "1",
+        "config": {
+            "host": fake.url,
+            "token": "bench-token",
+            "appname": "-",
+            "directory": "databricks_bench",
+            "main_module": "databricks_connector.py",
+            **(config or {}),
+        },
+        "parameters": [param],
+    }
+
+    connector = BenchmarkConnector()
+    start = time.perf_counter()
+    ret_val = connector._handle_action(json.dumps(in_json), None)
+    elapsed = time.perf_counter() - start
+
+    return {"elapsed": elapsed, "result": json.loads(ret_val)}
+
+
+def prepare_param(fake: FakeDatabricks, param: dict) -> dict:
+    if param is not None:
+        return dict(param)
+
+    # Statement lookups need a statement the fake knows about
+    response = run_action(fake, "perform_query", QUERY_PARAM, False)
+    statement_id = response["result"][0]["data"][0]["statement_id"]
+    return {"statement_id": statement_id}
+
+
+def benchmark(fake: FakeDatabricks, scenario: str, iterations: int, cold_client: bool) -> dict:
+    action_id, param = SCENARIOS[scenario]
+    param = prepare_param(fake, param)
+    config = SCENARIO_CONFIG.get(scenario)
+
+    # Warm up imports and, unless measuring cold clients, the client cache
+    run_action(fake, action_id, param, cold_client, config)
+
+    latencies = []
+    fake.reset_counts()
+    failures = 0
+    for _ in range(iterations):
+        if action_id == "on_poll":
+            fake.advance_alerts()
+        run = run_action(fake, action_id, param, cold_client, config)
+        latencies.append(run["elapsed"])
+        failures += any(result.get("status") != "success" for result in run["result"])
+
+    requests_per_run = sum(fake.request_counts.values()) / iterations
+    response_bytes_per_run = fake.response_bytes / iterations
+    routes = {route: count / iterations for route, count in sorted(fake.request_counts.items())}
+
+    # Peak memory is measured on a separate run, tracing would distort the latencies
+    tracemalloc.start()
+    run_action(fake, action_id, param, cold_client, config)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "scenario": scenario,
+        "action_id": action_id,
+        "iterations": iterations,
+        "failures": failures,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "requests_per_run": requests_per_run,
+        "response_kib_per_run": response_bytes_per_run / 1024,
+        "peak_memory_kib": peak_memory / 1024,
+        "requests_by_route": routes,
+    }
+
+
+def print_report(results: list[dict]):
+    header = f"{'scenario':<30} {'p50 ms':>9} {'p99 ms':>9} {'req/run':>8} {'KiB/run':>9} {'peak KiB':>9} {'fail':>5}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['scenario']:<30} {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['requests_per_run']:>8.1f} "
+            f"{result['response_kib_per_run']:>9.1f} {result['peak_memory_kib']:>9.0f} {result['failures']:>5}"
+        )
+
+
+def main():
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("scenarios", nargs="*", default=list(SCENARIOS), help="Scenarios to run (default: all)")
+    argparser.add_argument("--iterations", type=int, default=20, help="Measured runs per scenario")
+    argparser.add_argument("--latency", type=float, default=0.0, help="Seconds of latency added to every API response")
+    argparser.add_argument("--result-rows", type=int, default=1000, help="Rows returned by every statement")
+    argparser.add_argument("--chunk-rows", type=int, default=250, help="Rows per result chunk")
+    argparser.add_argument("--statement-polls", type=int, default=2, help="Polls an asynchronous statement stays RUNNING for")
+    argparser.add_argument("--alerts", type=int, default=100, help="Alerts in the workspace")
+    argparser.add_argument("--tasks", type=int, default=10, help="Task runs per job run")
+    argparser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of API requests that fail")
+    argparser.add_argument("--failure-status", type=int, default=503, help="HTTP status of injected failures")
+    argparser.add_argument("--cold-client", action="store_true", help="Build a new API client for every run, as a fresh action process would")
+    argparser.add_argument("--seed", type=int, default=0, help="Seed for failure injection and alert triggering")
+    argparser.add_argument("--json", help="Also write the results to this file")
+    args = argparser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        argparser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    fake = FakeDatabricks(
+        latency=args.latency,
+        result_rows=args.result_rows,
+        chunk_rows=args.chunk_rows,
+        statement_polls=args.statement_polls,
+        failure_rate=args.failure_rate,
+        failure_status=args.failure_status,
+        alerts=args.alerts,
+        tasks=args.tasks,
+        seed=args.seed,
+    )
+
+    with fake:
+        results = [benchmark(fake, scenario, args.iterations, args.cold_client) for scenario in args.scenarios]
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# File: benchmarks/bench_startup.py
+#
+# Copyright (c) 2024-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+"""Start-up benchmark of the connector, as paid by every action run.
+
+The platform starts a new Python process for each action, so the import of the connector and the
+first action of the process are on the critical path of every playbook step. For each action ID
+this script starts fresh interpreters that import ``databricks_connector`` and run the action once
+against ``fake_databricks.FakeDatabricks``, and reports the median import time, first-action
+latency, and whether the Databricks SDK had to be imported at all. Needs the SOAR platform
+libraries (``phantom``) and the app dependencies.
+
+Example::
+
+    python benchmarks/bench_startup.py --runs 10
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import requests
+
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def child(url: str, action_id: str, param: dict):
+    """Runs in the fresh interpreter: import the connector, run one action and print the timings."""
+    sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+    sys.path.insert(0, BENCHMARK_DIR)
+
+    start = time.perf_counter()
+    import databricks_connector  # noqa: F401
+
+    import_seconds = time.perf_counter() - start
+    sdk_imported_at_startup = "databricks.sdk" in sys.modules
+
+    import bench_connector
+
+    run = bench_connector.run_action(SimpleNamespace(url=url), action_id, param, False)
+
+    print(
+        json.dumps(
+            {
+                "import_seconds": import_seconds,
+                "action_seconds": run["elapsed"],
+                "sdk_imported_at_startup": sdk_imported_at_startup,
+                "sdk_imported": "databricks.sdk" in sys.modules,
+                "status": run["result"][0].get("status") if run["result"] else None,
+            }
+        )
+    )
+
+
+def create_statement(url: str, warehouse_id: str) -> str:
+    response = requests.post(f"{url}/api/2.0/sql/statements/", json={"statement": "SELECT 1", "warehouse_id": warehouse_id}, timeout=10)
+    response.raise_for_status()
+    return response.json()["statement_id"]
+
+
+def measure(url: str, action_id: str, param: dict, runs: int) -> dict:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", url, action_id, json.dumps(param)],
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        samples.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    return {
+        "action_id": action_id,
+        "runs": runs,
+        "import_ms": statistics.median(sample["import_seconds"] for sample in samples) * 1000,
+        "first_action_ms": statistics.median(sample["action_seconds"] for sample in samples) * 1000,
+        "sdk_imported_at_startup": any(sample["sdk_imported_at_startup"] for sample in samples),
+        "sdk_imported": any(sample["sdk_imported"] for sample in samples),
+        "failures": sum(sample["status"] != "success" for sample in samples),
+    }
+
+
+def print_report(results: list[dict]):
+    header = f"{'action':<24} {'import ms':>10} {'action ms':>10} {'total ms':>10} {'sdk':>5} {'fail':>5}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['action_id']:<24} {result['import_ms']:>10.1f} {result['first_action_ms']:>10.1f} "
+            f"{result['import_ms'] + result['first_action_ms']:>10.1f} {'yes' if result['sdk_imported'] else 'no':>5} {result['failures']:>5}"
+        )
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == "--child":
+        child(sys.argv[2], sys.argv[3], json.loads(sys.argv[4]))
+        return
+
+    sys.path.insert(0, BENCHMARK_DIR)
+    from bench_connector import SCENARIOS, WAREHOUSE_ID
+    from fake_databricks import FakeDatabricks
+
+    # The first scenario of every action ID stands for that action
+    actions = {}
+    for action_id, param in SCENARIOS.values():
+        actions.setdefault(action_id, param)
+
+    argparser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argparser.add_argument("actions", nargs="*", default=list(actions), help="Action IDs to run (default: all)")
+    argparser.add_argument("--runs", type=int, default=5, help="Fresh processes started per action")
+    argparser.add_argument("--latency", type=float, default=0.0, help="Seconds of latency added to every API response")
+    argparser.add_argument("--json", help="Also write the results to this file")
+    args = argparser.parse_args()
+
+    unknown = set(args.actions) - set(actions)
+    if unknown:
+        argparser.error(f"unknown actions: {', '.join(sorted(unknown))}")
+
+    with FakeDatabricks(latency=args.latency) as fake:
+        results = []
+        for action_id in args.actions:
+            param = actions[action_id]
+            if param is None:
+                param = {"statement_id": create_statement(fake.url, WAREHOUSE_ID)}
+            results.append(measure(fake.url, action_id, param, args.runs))
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+# File: benchmarks/fake_databricks.py
+#
+# Copyright (c) 2024-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+#
+"""Local stand-in for the parts of the Databricks REST API used by the connector.
+
+Serves alerts, data sources, clusters, SQL warehouses, statement execution (with chunked INLINE and
+EXTERNAL_LINKS results), one-time job runs and DBFS/workspace status from memory, with
+configurable latency, result chunk size and failure injection. Every request is counted
+per route so benchmarks can report how many calls an action made.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+
+DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+RESULT_COLUMNS = [
+    {"name": "id", "position": 0, "type_name": "LONG", "type_text": "BIGINT"},
+    {"name": "name", "position": 1, "type_name": "STRING", "type_text": "STRING"},
+    {"name": "score", "position": 2, "type_name": "DOUBLE", "type_text": "DOUBLE"},
+    {"name": "seen_at", "position": 3, "type_name": "TIMESTAMP", "type_text": "TIMESTAMP"},
+]
+
+
+class FakeDatabricks:
+    """In-memory Databricks workspace served over HTTP on localhost.
+
+    :param latency: seconds added to every response
+    :param result_rows: number of rows returned by every statement
+    :param chunk_rows: number of rows per result chunk
+    :param statement_polls: number of get_statement calls an asynchronous statement stays RUNNING for
+    :param failure_rate: fraction of requests answered with ``failure_status``
+    :param failure_status: HTTP status used for injected failures
+    :param alerts: number of alerts in the workspace
+    :param triggered_fraction: fraction of alerts re-triggered between two alert listings
+    :param tasks: number of task runs in every job run
+    :param seed: seed for the failure injection and alert triggering
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        result_rows: int = 1000,
+        chunk_rows: int = 250,
+        statement_polls: int = 2,
+        failure_rate: float = 0.0,
+        failure_status: int = 503,
+        alerts: int = 100,
+        triggered_fraction: float = 0.1,
+        tasks: int = 10,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.result_rows = result_rows
+        self.chunk_rows = max(1, chunk_rows)
+        self.statement_polls = statement_polls
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.triggered_fraction = triggered_fraction
+        self.tasks = tasks
+
+        self.request_counts = Counter()
+        self.response_bytes = 0
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._statements = {}
+        self._runs = {}
+        self._next_run_id = 1000
+
+        base_time = datetime(2024, 5, 17, tzinfo=timezone.utc)
+        self._clock = base_time
+        self._alerts = {
+            str(uuid.UUID(int=index)): {
+                "id": str(uuid.UUID(int=index)),
+                "name": f"alert {index}",
+                "state": "ok",
+                "created_at": base_time.strftime(DATETIME_FORMAT),
+                "updated_at": base_time.strftime(DATETIME_FORMAT),
+                "last_triggered_at": (base_time + timedelta(seconds=index)).strftime(DATETIME_FORMAT),
+                "options": {"column": "score", "op": ">", "value": "0.5"},
+                "query": {
+                    "id": f"query-{index}",
+                    "name": f"query {index}",
+                    "query": f"SELECT * FROM events_{index}",
+                    "data_source_id": f"data-source-{index % 5}",
+                },
+            }
+            for index in range(alerts)
+        }
+
+        self._routes = [
+            ("GET", r"/api/2\.0/preview/sql/alerts", self._list_alerts),
+            ("POST", r"/api/2\.0/preview/sql/alerts", self._create_alert),
+            ("GET", r"/api/2\.0/preview/sql/alerts/(?P<alert_id>[^/]+)", self._get_alert),
+            ("DELETE", r"/api/2\.0/preview/sql/alerts/(?P<alert_id>[^/]+)", self._delete_alert),
+            ("GET", r"/api/2\.0/preview/sql/data_sources", self._list_data_sources),
+            ("GET", r"/api/2\.0/clusters/list", self._list_clusters),
+            ("GET", r"/api/2\.0/sql/warehouses", self._list_warehouses),
+            ("GET", r"/api/2\.0/sql/warehouses/(?P<warehouse_id>[^/]+)", self._get_warehouse),
+            ("POST", r"/api/2\.0/sql/warehouses/(?P<warehouse_id>[^/]+)/start", self._start_warehouse),
+            ("POST", r"/api/2\.0/sql/statements/?", self._execute_statement),
+            ("GET", r"/api/2\.0/sql/statements/(?P<statement_id>[^/]+)", self._get_statement),
+            ("GET", r"/api/2\.0/sql/statements/(?P<statement_id>[^/]+)/result/chunks/(?P<chunk_index>\d+)", self._get_chunk),
+            ("POST", r"/api/2\.0/sql/statements/(?P<statement_id>[^/]+)/cancel", self._cancel_statement),
+            ("GET", r"/external/(?P<statement_id>[^/]+)/(?P<chunk_index>\d+)", self._get_external_chunk),
+            ("POST", r"/api/2\.1/jobs/runs/submit", self._submit_run),
+            ("GET", r"/api/2\.1/jobs/runs/get", self._get_run),
+            ("GET", r"/api/2\.1/jobs/runs/get-output", self._get_run_output),
+            ("GET", r"/api/2\.0/dbfs/get-status", self._dbfs_get_status),
+            ("GET", r"/api/2\.0/workspace/get-status", self._workspace_get_status),
+        ]
+        self._routes = [
+            (method, re.compile(f"^{pattern}$"), self._route_name(method, pattern), handler) for method, pattern, handler in self._routes
+        ]
+
+    @staticmethod
+    def _route_name(method: str, pattern: str) -> str:
+        path = re.sub(r"\(\?P<(\w+)>[^)]*\)", r"{\1}", pattern)
+        return f"{method} {path.replace('/?', '').replace(chr(92), '')}"
+
+    # Server lifecycle
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _dispatch(self):
+                fake._handle(self)
+
+            do_GET = do_POST = do_DELETE = do_PUT = do_PATCH = _dispatch
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_counts(self):
+        with self._lock:
+            self.request_counts.clear()
+            self.response_bytes = 0
+
+    def advance_alerts(self):
+        """Re-trigger a ``triggered_fraction`` of the alerts, as if time had passed between two polls."""
+        with self._lock:
+            self._clock += timedelta(minutes=1)
+            for alert in self._alerts.values():
+                if self._random.random() < self.triggered_fraction:
+                    alert["last_triggered_at"] = self._clock.strftime(DATETIME_FORMAT)
+
+    # Request plumbing
+
+    def _handle(self, request: BaseHTTPRequestHandler):
+        parsed = urlparse(request.path)
+        length = int(request.headers.get("Content-Length") or 0)
+        body = json.loads(request.rfile.read(length) or b"{}") if length else {}
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+
+        for method, pattern, route, handler in self._routes:
+            match = pattern.match(parsed.path)
+            if method == request.command and match:
+                break
+        else:
+            self._respond(request, 404, {"error_code": "ENDPOINT_NOT_FOUND", "message": f"No fake for {request.command} {parsed.path}"})
+            return
+
+        with self._lock:
+            self.request_counts[route] += 1
+            inject_failure = self._random.random() < self.failure_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+
+        if inject_failure:
+            headers = {"Retry-After": "1"} if self.failure_status == 429 else {}
+            self._respond(request, self.failure_status, {"error_code": "TEMPORARILY_UNAVAILABLE", "message": "Injected failure"}, headers)
+            return
+
+        try:
+            status, payload = handler(body=body, query=query, **match.groupdict())
+        except KeyError as e:
+            status, payload = 404, {"error_code": "RESOURCE_DOES_NOT_EXIST", "message": f"{e} does not exist"}
+
+        self._respond(request, status, payload)
+
+    def _respond(self, request: BaseHTTPRequestHandler, status: int, payload, headers: Optional[dict] = None):
+        content = json.dumps(payload).encode("utf-8")
+        with self._lock:
+            self.response_bytes += len(content)
+
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(content)
+
+    # Alerts
+
+    def _list_alerts(self, body, query):
+        with self._lock:
+            return 200, list(self._alerts.values())
+
+    def _create_alert(self, body, query):
+        alert_id = str(uuid.uuid4())
+        alert = dict(body, id=alert_id, state="unknown", created_at=self._clock.strftime(DATETIME_FORMAT))
+        with self._lock:
+            self._alerts[alert_id] = alert
+        return 200, alert
+
+    def _get_alert(self, body, query, alert_id):
+        return 200, self._alerts[alert_id]
+
+    def _delete_alert(self, body, query, alert_id):
+        with self._lock:
+            del self._alerts[alert_id]
+        return 200, {}
+
+    # Clusters and warehouses
+
+    def _list_clusters(self, body, query):
+        clusters = [
+            {"cluster_id": f"0517-000000-{index:08d}", "cluster_name": f"cluster {index}", "state": "RUNNING" if index % 2 else "TERMINATED"}
+            for index in range(20)
+        ]
+        return 200, {"clusters": clusters}
+
+    @staticmethod
+    def _warehouse(warehouse_id: str) -> dict:
+        # Warehouse 4 is stopped, the others run with a different number of sessions. Even ones are tagged team=soc.
+        try:
+            index = int(warehouse_id, 16)
+        except ValueError:
+            index = 0
+        return {
+            "id": warehouse_id,
+            "name": f"warehouse {warehouse_id}",
+            "state": "STOPPED" if index == 4 else "RUNNING",
+            "num_clusters": 0 if index == 4 else 1,
+            "max_num_clusters": 2,
+            "num_active_sessions": index % 4,
+            "cluster_size": "2X-Small",
+            "tags": {"custom_tags": [{"key": "team", "value": "soc" if index % 2 == 0 else "it"}]},
+        }
+
+    def _list_data_sources(self, body, query):
+        return 200, [{"id": f"data-source-{index}", "name": f"warehouse {index:016x}", "warehouse_id": f"{index:016x}"} for index in range(5)]
+
+    def _list_warehouses(self, body, query):
+        return 200, {"warehouses": [self._warehouse(f"{index:016x}") for index in range(5)]}
+
+    def _get_warehouse(self, body, query, warehouse_id):
+        return 200, self._warehouse(warehouse_id)
+
+    def _start_warehouse(self, body, query, warehouse_id):
+        return 200, {}
+
+    # Statement execution
+
+    def _rows(self, start: int, end: int) -> list:
+        return [[str(row), f"name {row}", f"{row / 7:.4f}", "2024-05-17T10:11:12.000Z"] for row in range(start, end)]
+
+    def _chunk(self, statement: dict, chunk_index: int) -> dict:
+        start = chunk_index * self.chunk_rows
+        end = min(start + self.chunk_rows, self.result_rows)
+        has_next = end < self.result_rows
+        chunk = {"chunk_index": chunk_index, "row_offset": start, "row_count": end - start}
+
+        if statement["disposition"] == "EXTERNAL_LINKS":
+            link = dict(chunk, external_link=f"{self.url}/external/{statement['statement_id']}/{chunk_index}")
+            if has_next:
+                link["next_chunk_index"] = chunk_index + 1
+            return {"external_links": [link]}
+
+        chunk["data_array"] = self._rows(start, end)
+        if has_next:
+            chunk["next_chunk_index"] = chunk_index + 1
+        return chunk
+
+    def _statement_response(self, statement: dict) -> dict:
+        response = {"statement_id": statement["statement_id"], "status": {"state": statement["state"]}}
+        if statement["state"] != "SUCCEEDED":
+            return response
+
+        total_chunks = max(1, -(-self.result_rows // self.chunk_rows))
+        response["manifest"] = {
+            "format": statement["format"],
+            "schema": {"column_count": len(RESULT_COLUMNS), "columns": RESULT_COLUMNS},
+            "total_row_count": self.result_rows,
+            "total_chunk_count": total_chunks,
+        }
+        response["result"] = self._chunk(statement, 0)
+        return response
+
+    def _execute_statement(self, body, query):
+        statement = {
+            "statement_id": str(uuid.uuid4()),
+            "disposition": body.get("disposition", "INLINE"),
+            "format": body.get("format", "JSON_ARRAY"),
+            "remaining_polls": self.statement_polls if body.get("wait_timeout") == "0s" else 0,
+        }
+        statement["state"] = "RUNNING" if statement["remaining_polls"] else "SUCCEEDED"
+        with self._lock:
+            self._statements[statement["statement_id"]] = statement
+        return 200, self._statement_response(statement)
+
+    def _get_statement(self, body, query, statement_id):
+        with self._lock:
+            statement = self._statements[statement_id]
+            if statement["state"] == "RUNNING":
+                statement["remaining_polls"] -= 1
+                if statement["remaining_polls"] <= 0:
+                    statement["state"] = "SUCCEEDED"
+        return 200, self._statement_response(statement)
+
+    def _get_chunk(self, body, query, statement_id, chunk_index):
+        return 200, self._chunk(self._statements[statement_id], int(chunk_index))
+
+    def _get_external_chunk(self, body, query, statement_id, chunk_index):
+        start = int(chunk_index) * self.chunk_rows
+        return 200, self._rows(start, min(start + self.chunk_rows, self.result_rows))
+
+    def _cancel_statement(self, body, query, statement_id):
+        with self._lock:
+            self._statements[statement_id]["state"] = "CANCELED"
+        return 200, {}
+
+    # Jobs
+
+    def _run(self, run_id: int) -> dict:
+        state = {"life_cycle_state": "TERMINATED", "result_state": "SUCCESS", "state_message": ""}
+        tasks = [
+            {"run_id": run_id * 100 + index, "task_key": f"task_{index}", "state": state, "notebook_task": {"notebook_path": "/Shared/bench"}}
+            for index in range(self.tasks)
+        ]
+        return {"run_id": run_id, "job_id": 1, "run_name": "bench", "run_type": "SUBMIT_RUN", "state": state, "tasks": tasks}
+
+    def _submit_run(self, body, query):
+        with self._lock:
+            run_id = self._next_run_id
+            self._next_run_id += 1
+            self._runs[run_id] = body
+        return 200, {"run_id": run_id}
+
+    def _get_run(self, body, query):
+        return 200, self._run(int(query["run_id"]))
+
+    def _get_run_output(self, body, query):
+        run_id = int(query["run_id"])
+        return 200, {
+            "metadata": {"run_id": run_id, "task_key": f"task_{run_id % 100}"},
+            "notebook_output": {"result": f"output of {run_id}", "truncated": False},
+        }
+
+    # DBFS and workspace
+
+    def _dbfs_get_status(self, body, query):
+        return 200, {"path": query.get("path", "/"), "is_dir": True, "file_size": 0}
+
+    def _workspace_get_status(self, body, query):
+        return 200, {"path": query.get("path", "/"), "object_type": "DIRECTORY", "object_id": 1234}
@@ -0,0 +1,74 @@
+# File: databricks_actions.py
+#
+# Copyright (c) 2024-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+from typing import Callable, Optional
+
+
+class ActionHandler:
+    """An action of the app, the connector method that runs it and what the method needs.
+
+    ``timeout`` and ``max_concurrency`` are the defaults of the action's own timeout and
+    concurrency parameters.
+    """
+
+    def __init__(
+        self,
+        action_id: str,
+        func: Callable,
+        timeout: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.action_id = action_id
+        self.func = func
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+
+
+class ActionRegistry:
+    """Maps action IDs to their handlers. Connector methods add themselves with the ``register`` decorator."""
+
+    def __init__(self):
+        self._handlers: dict[str, ActionHandler] = {}
+
+    def register(
+        self,
+        action_id: str,
+        timeout: Optional[int] = None,
+        max_concurrency: Optional[int] = None,
+    ) -> Callable:
+        def decorator(func: Callable) -> Callable:
+            if action_id in self._handlers:
+                raise ValueError(f"Action {action_id} is already registered")
+            self._handlers[action_id] = ActionHandler(action_id, func, timeout, max_concurrency)
+            return func
+
+        return decorator
+
+    def get(self, action_id: str) -> Optional[ActionHandler]:
+        return self._handlers.get(action_id)
+
+    def action_ids(self) -> list[str]:
+        return list(self._handlers)
+
+
+def record_run(totals: dict, action_id: str, seconds: float, succeeded: bool, raised: bool) -> dict:
+    """Add one run of an action to the per-action totals kept in the state file."""
+    action_totals = totals.setdefault(action_id, {"runs": 0, "failures": 0, "exceptions": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+    action_totals["runs"] += 1
+    action_totals["failures"] += not succeeded
+    action_totals["exceptions"] += raised
+    action_totals["total_seconds"] = round(action_totals["total_seconds"] + seconds, 3)
+    action_totals["max_seconds"] = round(max(action_totals["max_seconds"], seconds), 3)
+    return totals
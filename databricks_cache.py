@@ -0,0 +1,265 @@
+# File: databricks_cache.py
+#
+# Copyright (c) 2024-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import Optional
+
+from databricks_templates import skip_quoted
+
+
+def normalize_statement(statement: str) -> str:
+    """Collapse whitespace and drop a trailing semicolon, leaving quoted literals and identifiers untouched."""
+    statement = statement.strip().rstrip(";").rstrip()
+    normalized = []
+    pending_space = False
+    index = 0
+
+    while index < len(statement):
+        char = statement[index]
+        if char.isspace():
+            pending_space = True
+            index += 1
+            continue
+
+        if pending_space and normalized:
+            normalized.append(" ")
+        pending_space = False
+
+        if char in ("'", '"', "`"):
+            try:
+                end = skip_quoted(statement, index)
+            except ValueError:
+                # The statement is kept as it is from an unterminated quote on, Databricks rejects it anyway
+                end = len(statement)
+            normalized.append(statement[index:end])
+            index = end
+        else:
+            normalized.append(char)
+            index += 1
+
+    return "".join(normalized)
+
+
+def cache_key(**fields) -> str:
+    return hashlib.sha256(json.dumps(fields, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class QueryResultCache:
+    """TTL cache of query results, stored as one JSON file per entry in the app state directory.
+
+    Reading an entry refreshes its modification time, which is what the least recently used
+    eviction goes by once the cache grows beyond ``max_entries`` or ``max_bytes``.
+    """
+
+    def __init__(self, directory: str, max_entries: int, max_bytes: int):
+        self._directory = directory
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.json")
+
+    def get(self, key: str, ttl: int) -> Optional[tuple[dict, float]]:
+        """Return the cached entry and its age in seconds, or None if it is missing or expired."""
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        age = time.time() - entry.get("created", 0)
+        if age > ttl:
+            self._remove(path)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return entry["value"], age
+
+    def put(self, key: str, value: dict):
+        os.makedirs(self._directory, exist_ok=True)
+
+        # Write to a temporary file first so concurrent readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"created": time.time(), "value": value}, f)
+            os.replace(temp_path, self._path(key))
+        except Exception:
+            self._remove(temp_path)
+            raise
+
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self._directory):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort(reverse=True)
+
+        kept_bytes = 0
+        for index, (_, size, path) in enumerate(entries):
+            kept_bytes += size
+            if index >= self._max_entries or kept_bytes > self._max_bytes:
+                self._remove(path)
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class InFlightRegistry:
+    """Statements being executed right now, shared by every action process of every asset of the app through its state directory.
+
+    Each key has one JSON file with the statement ID, which is None while the statement is still being
+    submitted, the token of the action that owns the entry and the time the entry expires. Entries are
+    only read and written under an exclusive lock, so two actions can never both own the same key.
+    """
+
+    def __init__(self, directory: str):
+        self._directory = directory
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.json")
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        os.makedirs(self._directory, exist_ok=True)
+        with open(os.path.join(self._directory, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._path(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("expires", 0) > time.time() else None
+
+    def _write(self, key: str, entry: dict):
+        with open(self._path(key), "w") as f:
+            json.dump(entry, f)
+
+    def claim(self, key: str, ttl: float) -> tuple[Optional[str], Optional[str]]:
+        """Take ownership of ``key`` for ``ttl`` seconds unless another action owns it.
+
+        Returns ``(token, None)`` if the caller now owns the key and has to ``register`` or ``release`` it,
+        and ``(None, statement_id)`` if another action does, with a statement ID of None while that action
+        is still submitting the statement.
+        """
+        with self._lock():
+            entry = self._read(key)
+            if entry is not None:
+                return None, entry["statement_id"]
+
+            token = uuid.uuid4().hex
+            self._write(key, {"token": token, "statement_id": None, "expires": time.time() + ttl})
+            return token, None
+
+    def register(self, key: str, token: str, statement_id: str, ttl: float):
+        """Publish the ID of the submitted statement, for ``ttl`` more seconds."""
+        with self._lock():
+            entry = self._read(key)
+            if entry is not None and entry["token"] == token:
+                self._write(key, {"token": token, "statement_id": statement_id, "expires": time.time() + ttl})
+
+    def release(self, key: str, token: str):
+        """Remove the entry of ``key``, as long as it still belongs to ``token``."""
+        with self._lock():
+            entry = self._read(key)
+            if entry is None or entry["token"] == token:
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+
+
+class MetadataCache:
+    """Name to ID lookups of workspace objects, kept in the connector state so they survive between actions.
+
+    ``entries`` is the dict stored in the state, with one ``{name: {"id": ..., "cached_at": ...}}``
+    mapping per kind of object. Entries older than ``ttl`` seconds are treated as missing, a ``ttl``
+    of 0 turns the cache off.
+    """
+
+    def __init__(self, entries: dict, ttl: int, max_entries: int):
+        self._entries = entries
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind: str, name: str) -> Optional[str]:
+        entry = self._entries.get(kind, {}).get(name)
+        if entry is None or time.time() - entry["cached_at"] > self._ttl:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry["id"]
+
+    def put(self, kind: str, name: str, object_id: str):
+        if self._ttl <= 0:
+            return
+
+        kind_entries = self._entries.setdefault(kind, {})
+        kind_entries[name] = {"id": object_id, "cached_at": time.time()}
+
+        if len(kind_entries) > self._max_entries:
+            oldest = sorted(kind_entries, key=lambda key: kind_entries[key]["cached_at"])
+            for key in oldest[: len(kind_entries) - self._max_entries]:
+                del kind_entries[key]
+
+    def invalidate(self, kind: str, name: str) -> bool:
+        """Drop the entry of a name whose ID turned out to be stale. Returns whether there was one."""
+        return self._entries.get(kind, {}).pop(name, None) is not None
+
+    def replace(self, kind: str, ids_by_name: dict[str, str]):
+        """Replace every entry of ``kind`` with a fresh listing, which also forgets deleted or renamed objects."""
+        if self._ttl <= 0:
+            return
+
+        self._entries[kind] = {}
+        for name, object_id in ids_by_name.items():
+            self.put(kind, name, object_id)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses}
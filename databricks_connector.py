@@ -14,10 +14,23 @@
 # and limitations under the License.
 #
 
+import calendar
+import fnmatch
+import hashlib
 import json
+import os
+import sys
+import tempfile
+import threading
+import time
 import traceback
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
 from datetime import datetime
-from typing import Optional
+from itertools import islice
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
 
 import phantom.app as phantom
 import requests
@@ -25,12 +38,36 @@ from phantom.action_result import ActionResult
 from phantom.base_connector import BaseConnector
 
 import databricks_consts as consts
-from databricks.sdk import WorkspaceClient
-from databricks.sdk.service.compute import ClusterSpec, Library
-from databricks.sdk.service.iam import AccessControlRequest
-from databricks.sdk.service.jobs import GitSource, NotebookTask, Run, RunResultState, SubmitTask
-from databricks.sdk.service.sql import AlertOptions, AlertOptionsEmptyResultState, Disposition, ExecuteStatementRequestOnWaitTimeout, Format
-from databricks.sdk.service.workspace import ObjectType
+import databricks_instrumentation as instrumentation
+from databricks_actions import ActionHandler, ActionRegistry, record_run
+from databricks_cache import InFlightRegistry, MetadataCache, QueryResultCache, cache_key, normalize_statement
+from databricks_export import (
+    EXPORT_FILE_EXTENSIONS,
+    EXPORT_FORMAT_NDJSON_GZ,
+    EXPORT_FORMAT_NONE,
+    ResultExporter,
+    check_export_format,
+    open_exporter,
+)
+from databricks_results import RESULT_LAYOUT_RAW, apply_result_layout, arrow_available, decode_arrow_stream, decode_records, get_columns
+from databricks_routing import STOPPED_STATES, has_tag, parse_tag, parse_warehouse_ids, rank_warehouses, warehouse_summary
+from databricks_scheduler import RequestScheduler, SingleAttemptClock, backoff_delays
+from databricks_templates import bind_parameters
+
+
+# The SDK package imports every service module up front, which takes most of the connector start
+# time. It is only imported once an action needs a client, so actions that return early skip it.
+if TYPE_CHECKING:
+    from databricks.sdk import WorkspaceClient
+    from databricks.sdk.service.jobs import Run
+    from databricks.sdk.service.sql import (
+        ExecuteStatementResponse,
+        ExternalLink,
+        Format,
+        GetStatementResponse,
+        ResultData,
+        StatementParameterListItem,
+    )
 
 
 class RetVal(tuple):
@@ -38,6 +75,136 @@ class RetVal(tuple):
         return tuple.__new__(RetVal, (val1, val2))
 
 
+class ApiClientCache:
+    """Process-wide cache of WorkspaceClient instances keyed on (host, auth identity).
+
+    Building a WorkspaceClient resolves the config, sets up authentication and opens a new
+    HTTP session, so it is reused for every action handled by this connector process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients: dict[tuple[str, str], WorkspaceClient] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def auth_identity(username: Optional[str], password: Optional[str], token: Optional[str]) -> str:
+        # Only a digest of the credentials is kept around as part of the key
+        secret = "\0".join(value or "" for value in (username, password, token))
+        return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+    def get(self, host: str, username: Optional[str], password: Optional[str], token: Optional[str]) -> "WorkspaceClient":
+        from databricks.sdk import WorkspaceClient
+        from databricks.sdk.core import Config
+
+        key = (host, self.auth_identity(username, password, token))
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self.hits += 1
+                return client
+
+            self.misses += 1
+
+            # Credentials for this host changed, so any client built with the old ones is stale
+            for stale_key in [k for k in self._clients if k[0] == host]:
+                del self._clients[stale_key]
+
+            # Requests are retried by the request scheduler only, so the SDK makes a single attempt
+            client = WorkspaceClient(
+                config=Config(
+                    host=host,
+                    username=username,
+                    password=password,
+                    token=token,
+                    clock=SingleAttemptClock(),
+                )
+            )
+            self._clients[key] = client
+            return client
+
+    def invalidate(self, host: str, username: Optional[str], password: Optional[str], token: Optional[str]):
+        key = (host, self.auth_identity(username, password, token))
+        with self._lock:
+            self._clients.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._clients)}
+
+
+_API_CLIENT_CACHE = ApiClientCache()
+
+_ACTIONS = ActionRegistry()
+
+# Shared by every client of the process, so concurrent lookups draw from the same rate limits
+_REQUEST_SCHEDULER = RequestScheduler(
+    consts.REQUEST_RATE_LIMITS,
+    consts.REQUEST_MAX_RETRIES,
+    consts.REQUEST_RETRY_INITIAL_DELAY,
+    consts.REQUEST_RETRY_MAX_DELAY,
+)
+
+TERMINAL_RUN_LIFE_CYCLE_STATES = ("TERMINATED", "SKIPPED", "INTERNAL_ERROR")
+FAILED_RUN_RESULT_STATES = ("FAILED", "TIMEDOUT", "CANCELED")
+
+
+def iter_concurrently(func: Callable, items: Iterable, max_workers: int) -> Iterator[tuple[Any, Optional[Exception]]]:
+    """Call ``func`` on every item through a bounded thread pool, yielding the results as they are consumed.
+
+    Yields one ``(result, exception)`` pair per item, in the order of ``items``. An exception raised for
+    one item is returned in its pair instead of being propagated. At most ``max_workers`` items are in
+    flight, so a slow consumer holds no more than that many results in memory.
+    """
+
+    def call(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    items = list(items)
+    if not items:
+        return
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(call, item))
+            if len(pending) >= max_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def run_concurrently(func: Callable, items: Iterable, max_workers: int) -> list[tuple[Any, Optional[Exception]]]:
+    """Call ``func`` on every item through a bounded thread pool and return all ``(result, exception)`` pairs."""
+    return list(iter_concurrently(func, items, max_workers))
+
+
+def project_fields(data: dict, fields: Iterable[str]) -> dict:
+    """Keep only the given fields of ``data``. Dotted fields such as ``state.result_state`` select nested keys.
+
+    Fields missing from ``data`` are left out rather than set to None.
+    """
+    projected = {}
+    for field in fields:
+        keys = field.split(".")
+        value = data
+        for key in keys:
+            if not isinstance(value, dict) or key not in value:
+                break
+            value = value[key]
+        else:
+            target = projected
+            for key in keys[:-1]:
+                target = target.setdefault(key, {})
+            target[keys[-1]] = value
+    return projected
+
+
 class DatabricksConnector(BaseConnector):
     def __init__(self):
         super().__init__()
@@ -49,11 +216,20 @@ class DatabricksConnector(BaseConnector):
         self._password: Optional[str] = None
         self._token: Optional[str] = None
 
+        self._instrumentation_enabled = False
+        self._instrumentation: Optional[instrumentation.ActionInstrumentation] = None
+
+        self._metadata_cache: Optional[MetadataCache] = None
+
+        # Handler of the running action
+        self._action_handler: Optional[ActionHandler] = None
+
     def _get_error_msg_from_exception(self, e):
         error_code = None
         error_message = consts.DATABRICKS_ERROR_MESSAGE_UNAVAILABLE
 
-        self.error_print(traceback.format_exc())
+        # Exceptions of concurrent workers are handled outside of an except block, so format_exc() has nothing to show
+        self.error_print("".join(traceback.format_exception(type(e), e, e.__traceback__)))
 
         try:
             if hasattr(e, "args"):
@@ -92,19 +268,240 @@ class DatabricksConnector(BaseConnector):
 
         dict_to_update[key] = value
 
-    def _get_api_client(self) -> WorkspaceClient:
-        return WorkspaceClient(
-            host=self._host,
-            username=self._username,
-            password=self._password,
-            token=self._token,
+    def _get_api_client(self) -> "WorkspaceClient":
+        with self._phase("client"):
+            api_client = _API_CLIENT_CACHE.get(self._host, self._username, self._password, self._token)
+
+        _REQUEST_SCHEDULER.install(api_client.api_client._session)
+        if self._instrumentation is not None:
+            instrumentation.instrument_session(api_client.api_client._session)
+
+        return api_client
+
+    def _phase(self, name: str):
+        """Time a phase of the running action when instrumentation is enabled."""
+        if self._instrumentation is None:
+            return nullcontext()
+        return self._instrumentation.phase(name)
+
+    def _get_auth_identity(self) -> str:
+        return ApiClientCache.auth_identity(self._username, self._password, self._token)
+
+    def _invalidate_api_client(self):
+        self.debug_print("Discarding cached API client")
+        _API_CLIENT_CACHE.invalidate(self._host, self._username, self._password, self._token)
+
+    def _resolve_folder(self, path: str) -> str:
+        """Resolve a workspace directory path into the ``folders/<id>`` form used as an alert parent."""
+        folder = self._metadata_cache.get(consts.METADATA_KIND_FOLDER, path)
+        if folder is not None:
+            return folder
+
+        from databricks.sdk.service.workspace import ObjectType
+
+        status = self._get_api_client().workspace.get_status(path=path)
+        if status.object_type != ObjectType.DIRECTORY:
+            raise ValueError(f"parent path is not a folder: {path}")
+
+        folder = f"folders/{status.object_id}"
+        self._metadata_cache.put(consts.METADATA_KIND_FOLDER, path, folder)
+        return folder
+
+    def _resolve_by_name(self, kind: str, name: str, list_objects: Callable[[], Iterable[tuple[str, str]]]) -> str:
+        """Resolve the name of a warehouse or cluster into its ID.
+
+        A cache miss lists every object of that kind once, which refreshes the IDs of all other names as well.
+        Names shared by several objects are never cached, those objects have to be referred to by ID.
+        """
+        object_id = self._metadata_cache.get(kind, name)
+        if object_id is not None:
+            return object_id
+
+        ids_by_name = {}
+        duplicates = set()
+        for object_name, object_id in list_objects():
+            if object_name in ids_by_name:
+                duplicates.add(object_name)
+            ids_by_name[object_name] = object_id
+        for duplicate in duplicates:
+            del ids_by_name[duplicate]
+
+        self._metadata_cache.replace(kind, ids_by_name)
+
+        if name in duplicates:
+            raise ValueError(consts.METADATA_AMBIGUOUS_NAME_ERROR_MESSAGE.format(kind, name))
+        if name not in ids_by_name:
+            raise ValueError(consts.METADATA_UNKNOWN_NAME_ERROR_MESSAGE.format(kind, name))
+        return ids_by_name[name]
+
+    def _resolve_warehouse_name(self, name: str) -> str:
+        return self._resolve_by_name(
+            consts.METADATA_KIND_WAREHOUSE,
+            name,
+            lambda: ((warehouse.name, warehouse.id) for warehouse in self._get_api_client().warehouses.list()),
         )
 
+    def _resolve_cluster_name(self, name: str) -> str:
+        return self._resolve_by_name(
+            consts.METADATA_KIND_CLUSTER,
+            name,
+            lambda: ((cluster.cluster_name, cluster.cluster_id) for cluster in self._get_api_client().clusters.list()),
+        )
+
+    def _resolve_data_source_warehouse(self, data_source_id: str) -> str:
+        """Resolve the data source ID of a query into the ID of the warehouse behind it."""
+        return self._resolve_by_name(
+            consts.METADATA_KIND_DATA_SOURCE,
+            data_source_id,
+            lambda: (
+                (data_source.id, data_source.warehouse_id)
+                for data_source in self._get_api_client().data_sources.list()
+                if data_source.warehouse_id
+            ),
+        )
+
+    @staticmethod
+    def _is_not_found(exception: Exception) -> bool:
+        # An exception raised before the SDK was imported cannot come from it
+        sdk_errors = sys.modules.get("databricks.sdk.errors")
+        return sdk_errors is not None and isinstance(exception, sdk_errors.NotFound)
+
+    def _call_with_resolved_id(
+        self, kind: str, name: Optional[str], object_id: Optional[str], resolve: Callable[[str], str], call: Callable[[Optional[str]], Any]
+    ) -> Any:
+        """Call ``call`` with the ID that ``name`` resolved to, ``name`` is None for IDs given directly.
+
+        A cached ID outlives the object when it is deleted or recreated under the same name. If the
+        object is not found, the cache entry is dropped and the name resolved once more.
+        """
+        try:
+            return call(object_id)
+        except Exception as e:
+            if name is None or not self._is_not_found(e) or not self._metadata_cache.invalidate(kind, name):
+                raise
+
+        self.debug_print(f"The {kind} named {name} no longer has ID {object_id}, resolving it again")
+        return call(resolve(name))
+
+    def _get_warehouse_id(self, param: dict) -> str:
+        if "warehouse_id" in param:
+            return param["warehouse_id"]
+        if "warehouse_name" in param:
+            return self._resolve_warehouse_name(param["warehouse_name"])
+        if "warehouse_ids" in param or "warehouse_tag" in param:
+            return self._route_warehouse(param)
+        raise ValueError(consts.MISSING_WAREHOUSE_ERROR_MESSAGE)
+
+    @staticmethod
+    def _get_warehouse_pool(param: dict) -> Optional[dict]:
+        """The pool of warehouses a statement is routed to, or None if the statement names its warehouse.
+
+        Routed statements are cached and deduplicated by their pool, the warehouse routing picks changes
+        with the load of the pool.
+        """
+        if "warehouse_id" in param or "warehouse_name" in param:
+            return None
+        if "warehouse_ids" not in param and "warehouse_tag" not in param:
+            return None
+        return {
+            "warehouse_ids": sorted(set(parse_warehouse_ids(param["warehouse_ids"]))) if "warehouse_ids" in param else None,
+            "warehouse_tag": parse_tag(param["warehouse_tag"]) if "warehouse_tag" in param else None,
+        }
+
+    def _list_warehouse_states(self) -> list[dict]:
+        """State and load of every warehouse, from a listing that is kept in the asset state for a few seconds."""
+        cached = self._state.get(consts.STATE_WAREHOUSE_STATES_KEY)
+        if cached and time.time() - cached["cached_at"] <= consts.WAREHOUSE_STATE_CACHE_TTL:
+            return cached["warehouses"]
+
+        warehouses = [warehouse_summary(warehouse) for warehouse in self._get_api_client().warehouses.list()]
+        self._state[consts.STATE_WAREHOUSE_STATES_KEY] = {"cached_at": time.time(), "warehouses": warehouses}
+        return warehouses
+
+    def _route_warehouse(self, param: dict) -> str:
+        """Pick the warehouse of a pool, given as IDs or as a tag, that can run a statement soonest."""
+        warehouses = self._list_warehouse_states()
+
+        if "warehouse_ids" in param:
+            pool = set(parse_warehouse_ids(param["warehouse_ids"]))
+            warehouses = [warehouse for warehouse in warehouses if warehouse["id"] in pool]
+        if "warehouse_tag" in param:
+            key, value = parse_tag(param["warehouse_tag"])
+            warehouses = [warehouse for warehouse in warehouses if has_tag(warehouse, key, value)]
+
+        ranked = rank_warehouses(warehouses)
+        if not ranked:
+            raise ValueError(consts.ROUTE_WAREHOUSE_NO_CANDIDATE_ERROR_MESSAGE)
+
+        warehouse = ranked[0]
+        self.save_progress(f"Routing the statement to warehouse {warehouse['name']} ({warehouse['id']}), which is {warehouse['state']}")
+
+        # Only stopped warehouses are left, starting the best one now saves the statement a part of the cold start
+        if warehouse["state"] in STOPPED_STATES and param.get("start_stopped_warehouse", False):
+            try:
+                self._get_api_client().warehouses.start(warehouse["id"])
+                # Updates the cached listing too, so the following actions do not start it again
+                warehouse["state"] = "STARTING"
+            except Exception as e:
+                self.debug_print(f"Failed to start warehouse {warehouse['id']}. {self._get_error_msg_from_exception(e)}")
+
+        return warehouse["id"]
+
+    def _create_vault_file(self, file_name: str) -> str:
+        """Create an empty file in the temporary directory of the vault, from where it can be added to the vault."""
+        from phantom.vault import Vault
+
+        fd, path = tempfile.mkstemp(dir=Vault.get_vault_tmp_dir(), suffix=f"_{file_name}")
+        os.close(fd)
+        return path
+
+    def _add_to_vault(self, path: str, file_name: str) -> str:
+        from phantom.vault import Vault
+
+        response = Vault.add_attachment(path, self.get_container_id(), file_name=file_name)
+        if not response.get("succeeded"):
+            raise Exception(consts.VAULT_ADD_ERROR_MESSAGE.format(file_name, response.get("message")))
+        return response["vault_id"]
+
+    def _export_to_vault(
+        self, export_format: str, file_name: str, columns: Optional[list[dict]], preview_rows: int, write: Callable[[ResultExporter], None]
+    ) -> dict:
+        """Write a result into a new file with ``write``, one chunk at a time, and add the file to the vault.
+
+        Returns the vault ID, size, row count and preview of the file, which is all the action data keeps of the result.
+        """
+        path = self._create_vault_file(file_name)
+        try:
+            with self._phase("export"), open_exporter(export_format, path, columns, preview_rows) as exporter:
+                write(exporter)
+            file_size = os.path.getsize(path)
+            with self._phase("vault"):
+                vault_id = self._add_to_vault(path, file_name)
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+        return {
+            "vault_id": vault_id,
+            "file_name": file_name,
+            "export_format": export_format,
+            "file_size": file_size,
+            "row_count": exporter.row_count,
+            "preview": exporter.preview,
+        }
+
     def _report_error(self, action_result, exception, error_prefix):
+        # An exception raised before the SDK was imported cannot come from it
+        sdk_errors = sys.modules.get("databricks.sdk.errors")
+        if sdk_errors is not None and isinstance(exception, sdk_errors.Unauthenticated):
+            # The cached client holds credentials the server no longer accepts
+            self._invalidate_api_client()
+
         error_message = self._get_error_msg_from_exception(exception)
         self.save_progress(error_message)
         return action_result.set_status(phantom.APP_ERROR, error_prefix, error_message)
 
+    @_ACTIONS.register("test_connectivity")
     def _handle_test_connectivity(self, param):
         self.save_progress(consts.TEST_CONNECTIVITY_PROGRESS_MESSAGE)
 
@@ -119,11 +516,14 @@ class DatabricksConnector(BaseConnector):
         self.save_progress(consts.TEST_CONNECTIVITY_SUCCESS_MESSAGE)
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    @_ACTIONS.register("create_alert")
     def _handle_create_alert(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
         action_result = self.add_action_result(ActionResult(dict(param)))
 
+        from databricks.sdk.service.sql import AlertOptions, AlertOptionsEmptyResultState
+
         kwargs_options = {
             "column": param.get("column"),
             "op": param.get("operator"),
@@ -146,6 +546,8 @@ class DatabricksConnector(BaseConnector):
         try:
             api_client = self._get_api_client()
 
+            # Name of the folder behind a resolved ID, which may have to be resolved again if the folder was recreated
+            folder_path = None
             if "parent" in param:
                 # If the user provided a parent directory, check that it exists
                 # and resolve the path to an ID if needed
@@ -154,14 +556,18 @@ class DatabricksConnector(BaseConnector):
                     # Path is already resolved
                     kwargs_alert["parent"] = parent_path
                 else:
-                    # Need to resolve the path into a folder ID
-                    parent_obj = api_client.workspace.get_status(path=parent_path)
-                    if parent_obj.object_type == ObjectType.DIRECTORY:
-                        kwargs_alert["parent"] = f"folders/{parent_obj.object_id}"
-                    else:
-                        raise ValueError(f"parent path is not a folder: {parent_path}")
-
-            result = api_client.alerts.create(**kwargs_alert)
+                    # Need to resolve the path into a folder ID, unless it was resolved recently
+                    kwargs_alert["parent"] = self._resolve_folder(parent_path)
+                    folder_path = parent_path
+
+            def create_alert(parent: Optional[str]):
+                if parent is not None:
+                    kwargs_alert["parent"] = parent
+                return api_client.alerts.create(**kwargs_alert)
+
+            result = self._call_with_resolved_id(
+                consts.METADATA_KIND_FOLDER, folder_path, kwargs_alert.get("parent"), self._resolve_folder, create_alert
+            )
         except Exception as e:
             return self._report_error(action_result, e, consts.CREATE_ALERT_ERROR_MESSAGE)
 
@@ -172,44 +578,105 @@ class DatabricksConnector(BaseConnector):
         action_result.update_summary(summary)
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    def _iter_listing(
+        self,
+        items: Iterable,
+        param: dict,
+        get_name: Callable,
+        get_state: Callable,
+        get_creator: Callable,
+        get_updated: Optional[Callable] = None,
+    ) -> Iterator[dict]:
+        """Yield the items of an API listing that match the filter parameters, converted to dicts.
+
+        The listing is consumed lazily, so only matching items are converted and at most ``limit``
+        items are read. ``fields`` projects every item down to the given keys.
+        """
+        name_pattern = param.get("name_pattern", "").lower()
+        state = param.get("state", "").upper()
+        creator = param.get("creator", "").lower()
+        updated_since = self._to_epoch(param["updated_since"]) if get_updated and "updated_since" in param else None
+        fields = [field.strip() for field in param.get("fields", "").split(",") if field.strip()]
+        limit = int(param.get("limit", 0))
+
+        def matches(item) -> bool:
+            if name_pattern and not fnmatch.fnmatchcase((get_name(item) or "").lower(), name_pattern):
+                return False
+            if state and (get_state(item) is None or get_state(item).value.upper() != state):
+                return False
+            if creator and (get_creator(item) or "").lower() != creator:
+                return False
+            if updated_since is not None and (not get_updated(item) or self._to_epoch(get_updated(item)) < updated_since):
+                return False
+            return True
+
+        matching = filter(matches, items)
+        if limit > 0:
+            matching = islice(matching, limit)
+
+        for item in matching:
+            data = item.as_dict()
+            yield project_fields(data, fields) if fields else data
+
+    @_ACTIONS.register("list_alerts")
     def _handle_list_alerts(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
         action_result = self.add_action_result(ActionResult(dict(param)))
 
+        if "updated_since" in param:
+            try:
+                self._to_epoch(param["updated_since"])
+            except ValueError:
+                return action_result.set_status(phantom.APP_ERROR, consts.LIST_INVALID_UPDATED_SINCE_ERROR_MESSAGE)
+
+        total_alerts = 0
         try:
             api_client = self._get_api_client()
-            result = list(api_client.alerts.list())
+            alerts = self._iter_listing(
+                api_client.alerts.list(),
+                param,
+                get_name=lambda alert: alert.name,
+                get_state=lambda alert: alert.state,
+                get_creator=lambda alert: alert.user and alert.user.email,
+                get_updated=lambda alert: alert.updated_at,
+            )
+            for alert in alerts:
+                action_result.add_data(alert)
+                total_alerts += 1
         except Exception as e:
             return self._report_error(action_result, e, consts.LIST_ALERTS_ERROR_MESSAGE)
 
-        for item in result:
-            action_result.add_data(item.as_dict())
-
         summary = {
             "status": consts.LIST_ALERTS_SUCCESS_MESSAGE,
-            "Total alerts": len(result),
+            "Total alerts": total_alerts,
         }
 
         action_result.update_summary(summary)
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    @_ACTIONS.register("list_clusters")
     def _handle_list_clusters(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
         action_result = self.add_action_result(ActionResult(dict(param)))
 
+        total_clusters = 0
         try:
             api_client = self._get_api_client()
-            result = list(api_client.clusters.list())
+            clusters = self._iter_listing(
+                api_client.clusters.list(),
+                param,
+                get_name=lambda cluster: cluster.cluster_name,
+                get_state=lambda cluster: cluster.state,
+                get_creator=lambda cluster: cluster.creator_user_name,
+            )
+            for cluster in clusters:
+                action_result.add_data(cluster)
+                total_clusters += 1
         except Exception as e:
             return self._report_error(action_result, e, consts.LIST_CLUSTERS_ERROR_MESSAGE)
 
-        total_clusters = len(result)
-
-        for cluster in result:
-            action_result.add_data(cluster.as_dict())
-
         summary = {
             "status": consts.LIST_CLUSTERS_SUCCESS_MESSAGE,
             "Total Clusters": total_clusters,
@@ -218,6 +685,7 @@ class DatabricksConnector(BaseConnector):
         action_result.update_summary(summary)
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    @_ACTIONS.register("delete_alert")
     def _handle_delete_alert(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
@@ -237,22 +705,75 @@ class DatabricksConnector(BaseConnector):
         action_result.update_summary(summary)
 
         # also remove from state file if present
-        if "alerts" in self._state and alert_id in self._state["alerts"]:
-            del self._state["alerts"][alert_id]
+        self._state.get(consts.STATE_ALERTS_KEY, {}).pop(alert_id, None)
 
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    @_ACTIONS.register("perform_query", timeout=consts.PERFORM_QUERY_DEFAULT_POLL_TIMEOUT)
     def _handle_perform_query(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
         action_result = self.add_action_result(ActionResult(dict(param)))
 
+        export_format = param.get("export_format", EXPORT_FORMAT_NONE)
+        try:
+            # A pool is only routed once the statement is executed, cached and attached results need no warehouse
+            warehouse_pool = self._get_warehouse_pool(param)
+            warehouse_id = self._get_warehouse_id(param) if warehouse_pool is None else None
+            if export_format != EXPORT_FORMAT_NONE:
+                check_export_format(export_format, arrow_stream=param.get("format") == "ARROW_STREAM")
+        except Exception as e:
+            return self._report_error(action_result, e, consts.PERFORM_QUERY_ERROR_MESSAGE)
+
+        try:
+            parameters = bind_parameters(param["statement"], json.loads(param["parameters"])) if "parameters" in param else None
+        except ValueError as e:
+            return self._report_error(action_result, e, consts.PERFORM_QUERY_INVALID_PARAMETERS_ERROR_MESSAGE)
+
+        summary = {
+            "status": consts.PERFORM_QUERY_SUCCESS_MESSAGE,
+        }
+        if warehouse_id is not None and "warehouse_id" not in param:
+            summary["warehouse_id"] = warehouse_id
+
+        # Exports are added to the vault of the running container, so they never come from the cache
+        query_cache = None
+        query_cache_key = None
+        if param.get("use_cache", False) and export_format == EXPORT_FORMAT_NONE:
+            query_cache = self._get_query_cache()
+            query_cache_key = self._get_query_cache_key(param, warehouse_id, parameters)
+
+            if param.get("bypass_cache", False):
+                summary["cache"] = "bypass"
+            else:
+                cached = query_cache.get(query_cache_key, int(param.get("cache_ttl", consts.QUERY_CACHE_DEFAULT_TTL)))
+                if cached is not None:
+                    cached_response, age = cached
+                    action_result.add_data(cached_response["response"])
+                    summary.update(cached_response["summary"])
+                    summary["cache"] = "hit"
+                    summary["cache_age_seconds"] = round(age, 3)
+                    action_result.update_summary(summary)
+                    return action_result.set_status(phantom.APP_SUCCESS)
+
+                summary["cache"] = "miss"
+
+        # Built only after the cache lookup, a cache hit does not need the SDK at all
+        from databricks.sdk.service.sql import Disposition, ExecuteStatementRequestOnWaitTimeout, Format, StatementState
+
         data = {
             "statement": param["statement"],
-            "warehouse_id": param["warehouse_id"],
         }
-
-        if "wait_timeout" in param:
+        if parameters is not None:
+            data["parameters"] = self._get_statement_parameters(parameters)
+
+        # Deduplicated statements are always submitted asynchronously, so others can attach to them right away
+        deduplicate = param.get("deduplicate", False)
+        poll_until_complete = param.get("poll_until_complete", False) or deduplicate
+        if poll_until_complete:
+            # Submit asynchronously and poll for completion from within the connector
+            data["wait_timeout"] = "0s"
+        elif "wait_timeout" in param:
             data["wait_timeout"] = f"{param['wait_timeout']}s"
 
             # 'on_wait_timeout' can only be set if call is synchronous
@@ -270,21 +791,553 @@ class DatabricksConnector(BaseConnector):
         disposition = param.get("disposition")
         data["disposition"] = Disposition[disposition]
 
+        poll_timeout = int(param.get("poll_timeout", self._action_handler.timeout))
+        in_flight = None
+        in_flight_key = None
+        in_flight_token = None
+        attached = False
+        if deduplicate:
+            in_flight = InFlightRegistry(os.path.join(self.get_state_dir(), consts.IN_FLIGHT_DIRECTORY))
+
+        def execute(warehouse_id: Optional[str]):
+            nonlocal in_flight_key, in_flight_token, attached
+
+            def submit() -> "ExecuteStatementResponse":
+                data["warehouse_id"] = warehouse_id or self._route_warehouse(param)
+                return api_client.statement_execution.execute_statement(**data)
+
+            if not deduplicate:
+                return submit()
+            in_flight_key = self._get_in_flight_key(param, warehouse_id, parameters)
+            result, in_flight_token, attached = self._execute_deduplicated(api_client, submit, in_flight, in_flight_key, poll_timeout)
+            summary["deduplicated"] = attached
+            return result
+
         try:
             api_client = self._get_api_client()
-            result = api_client.statement_execution.execute_statement(**data)
+            with self._phase("execute"):
+                # Only a warehouse given by name can be resolved again, routed and given IDs are used as they are
+                warehouse_name = param.get("warehouse_name") if "warehouse_id" not in param else None
+                result = self._call_with_resolved_id(
+                    consts.METADATA_KIND_WAREHOUSE, warehouse_name, warehouse_id, self._resolve_warehouse_name, execute
+                )
+            if data.get("warehouse_id", warehouse_id) != warehouse_id:
+                # Routed, or the warehouse name was resolved again
+                summary["warehouse_id"] = data["warehouse_id"]
+                if warehouse_pool is None:
+                    warehouse_id = data["warehouse_id"]
+                    if query_cache_key is not None:
+                        query_cache_key = self._get_query_cache_key(param, warehouse_id, parameters)
+
+            if poll_until_complete:
+                # An attached action leaves the statement running on timeout, it belongs to another action
+                cancel_on_timeout = not attached
+                with self._phase("poll"):
+                    result, poll_metrics = self._wait_for_statement(api_client, result, poll_timeout, cancel_on_timeout)
+                summary.update(poll_metrics)
         except Exception as e:
             return self._report_error(action_result, e, consts.PERFORM_QUERY_ERROR_MESSAGE)
+        finally:
+            if in_flight_token is not None:
+                in_flight.release(in_flight_key, in_flight_token)
+
+        if export_format != EXPORT_FORMAT_NONE:
+            preview_rows = int(param.get("preview_rows", consts.EXPORT_DEFAULT_PREVIEW_ROWS))
+            return self._export_query_result(action_result, api_client, result, export_format, preview_rows, summary)
+
+        with self._phase("serialize"):
+            response = result.as_dict()
+        with self._phase("add_data"):
+            action_result.add_data(response)
+
+        if poll_until_complete and result.status.state != StatementState.SUCCEEDED:
+            error = result.status.error.message if result.status.error else None
+            summary["status"] = consts.PERFORM_QUERY_ERROR_MESSAGE
+            action_result.update_summary(summary)
+            return action_result.set_status(
+                phantom.APP_ERROR,
+                consts.PERFORM_QUERY_STATEMENT_FAILED_ERROR_MESSAGE.format(result.statement_id, result.status.state.value, error),
+            )
+
+        if param.get("fetch_all_chunks", False) and self._has_result(result):
+            max_rows = int(param.get("max_rows", consts.PERFORM_QUERY_DEFAULT_MAX_ROWS))
+            max_bytes = int(param.get("max_bytes", consts.PERFORM_QUERY_DEFAULT_MAX_BYTES))
+            try:
+                decode_arrow = param.get("decode_arrow_stream", False)
+                with self._phase("fetch_chunks"):
+                    summary.update(self._fetch_all_chunks(api_client, result, response, max_rows, max_bytes, decode_arrow))
+            except Exception as e:
+                return self._report_error(action_result, e, consts.PERFORM_QUERY_ERROR_MESSAGE)
 
-        action_result.add_data(result.as_dict())
+        try:
+            with self._phase("decode"):
+                apply_result_layout(response, param.get("result_layout", RESULT_LAYOUT_RAW))
+        except Exception as e:
+            return self._report_error(action_result, e, consts.PERFORM_QUERY_ERROR_MESSAGE)
+
+        # Only complete results are cached, external links expire and would go stale
+        if query_cache is not None and self._has_result(result) and not response.get("result", {}).get("external_links"):
+            cached_summary = {key: value for key, value in summary.items() if key not in ("status", "cache")}
+            try:
+                query_cache.put(query_cache_key, {"response": response, "summary": cached_summary})
+            except Exception as e:
+                self.debug_print(f"Failed to cache query result. {self._get_error_msg_from_exception(e)}")
+
+        action_result.update_summary(summary)
+
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    def _export_query_result(
+        self,
+        action_result,
+        api_client: "WorkspaceClient",
+        result: Union["ExecuteStatementResponse", "GetStatementResponse"],
+        export_format: str,
+        preview_rows: int,
+        summary: dict,
+    ):
+        """Stream every chunk of a statement result into a vault file instead of the action data."""
+        from databricks.sdk.service.sql import Format
+
+        if not self._has_result(result):
+            state = result.status.state.value if result.status else None
+            error = result.status.error.message if result.status and result.status.error else None
+            summary["status"] = consts.PERFORM_QUERY_ERROR_MESSAGE
+            action_result.update_summary(summary)
+            return action_result.set_status(
+                phantom.APP_ERROR, consts.PERFORM_QUERY_EXPORT_NO_RESULT_ERROR_MESSAGE.format(result.statement_id, state, error)
+            )
+
+        result_format = result.manifest.format if result.manifest else Format.JSON_ARRAY
+        columns = get_columns(result.manifest.as_dict()) if result.manifest else []
+        file_name = f"databricks_{result.statement_id}{EXPORT_FILE_EXTENSIONS[export_format]}"
+        fetched = {"bytes_fetched": 0, "chunks_fetched": 0}
+
+        def write(exporter: ResultExporter):
+            # ARROW_STREAM exports were checked for pyarrow before the statement was executed
+            chunks = self._iter_result_chunks(api_client, result.statement_id, result_format, result.result, decode_arrow=True)
+            for rows, byte_count, _ in chunks:
+                exporter.write_rows(rows)
+                fetched["bytes_fetched"] += byte_count
+                fetched["chunks_fetched"] += 1
+
+        try:
+            export = self._export_to_vault(export_format, file_name, columns, preview_rows, write)
+        except Exception as e:
+            return self._report_error(action_result, e, consts.PERFORM_QUERY_ERROR_MESSAGE)
+
+        action_result.add_data({"statement_id": result.statement_id, "status": result.status.as_dict(), "schema": columns, **export})
+
+        summary.update(fetched)
+        summary["rows_fetched"] = export["row_count"]
+        summary["vault_id"] = export["vault_id"]
+        action_result.update_summary(summary)
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    def _get_query_cache(self) -> QueryResultCache:
+        return QueryResultCache(
+            os.path.join(self.get_state_dir(), consts.QUERY_CACHE_DIRECTORY),
+            consts.QUERY_CACHE_MAX_ENTRIES,
+            consts.QUERY_CACHE_MAX_BYTES,
+        )
+
+    @staticmethod
+    def _get_statement_parameters(parameters: list[dict]) -> list["StatementParameterListItem"]:
+        from databricks.sdk.service.sql import StatementParameterListItem
+
+        return [StatementParameterListItem.from_dict(parameter) for parameter in parameters]
+
+    def _get_query_cache_key(self, param: dict, warehouse_id: Optional[str], parameters: Optional[list[dict]] = None) -> str:
+        # The cache directory is shared by every asset of the app, results are only served to the same credentials
+        return cache_key(
+            host=self._host,
+            auth_identity=self._get_auth_identity(),
+            statement=normalize_statement(param["statement"]),
+            parameters=parameters,
+            warehouse_id=warehouse_id,
+            warehouse_pool=self._get_warehouse_pool(param),
+            catalog=param.get("catalog"),
+            schema=param.get("schema"),
+            format=param.get("format"),
+            disposition=param.get("disposition"),
+            byte_limit=param.get("byte_limit"),
+            fetch_all_chunks=param.get("fetch_all_chunks", False),
+            max_rows=param.get("max_rows"),
+            max_bytes=param.get("max_bytes"),
+            decode_arrow_stream=param.get("decode_arrow_stream", False),
+            result_layout=param.get("result_layout", RESULT_LAYOUT_RAW),
+        )
+
+    def _get_in_flight_key(self, param: dict, warehouse_id: Optional[str], parameters: Optional[list[dict]] = None) -> str:
+        # Everything that shapes the result is part of the key, attached actions read the same result. The
+        # registry is shared by every asset of the app, so only actions with the same credentials attach.
+        return cache_key(
+            host=self._host,
+            auth_identity=self._get_auth_identity(),
+            statement=normalize_statement(param["statement"]),
+            parameters=parameters,
+            warehouse_id=warehouse_id,
+            warehouse_pool=self._get_warehouse_pool(param),
+            catalog=param.get("catalog"),
+            schema=param.get("schema"),
+            format=param.get("format"),
+            disposition=param.get("disposition"),
+            byte_limit=param.get("byte_limit"),
+        )
+
+    def _execute_deduplicated(
+        self,
+        api_client: "WorkspaceClient",
+        submit: Callable[[], "ExecuteStatementResponse"],
+        in_flight: InFlightRegistry,
+        key: str,
+        ttl: int,
+    ) -> tuple[Union["ExecuteStatementResponse", "GetStatementResponse"], Optional[str], bool]:
+        """Attach to an identical statement another action is executing, or execute it and register it for others.
+
+        Returns the statement, the registry token to release once done if this action registered the statement,
+        and whether it attached to another action's statement. If the owner of the key does not register its
+        statement in time, this action executes its own without registering it, and still owns it.
+        """
+        deadline = time.monotonic() + consts.IN_FLIGHT_SUBMIT_TIMEOUT
+        token, statement_id = in_flight.claim(key, consts.IN_FLIGHT_SUBMIT_TIMEOUT)
+        while token is None and statement_id is None:
+            # The owner is still submitting the statement
+            if time.monotonic() >= deadline:
+                self.save_progress(consts.IN_FLIGHT_SUBMIT_TIMEOUT_MESSAGE)
+                return submit(), None, False
+            time.sleep(consts.IN_FLIGHT_CHECK_INTERVAL)
+            token, statement_id = in_flight.claim(key, consts.IN_FLIGHT_SUBMIT_TIMEOUT)
+
+        if statement_id is not None:
+            self.save_progress(f"Attaching to statement {statement_id}, which another action is executing")
+            return api_client.statement_execution.get_statement(statement_id), None, True
+
+        try:
+            result = submit()
+        except Exception:
+            in_flight.release(key, token)
+            raise
+
+        in_flight.register(key, token, result.statement_id, ttl)
+        return result, token, False
+
+    def _wait_for_statement(
+        self,
+        api_client: "WorkspaceClient",
+        result: Union["ExecuteStatementResponse", "GetStatementResponse"],
+        poll_timeout: int,
+        cancel_on_timeout: bool = True,
+    ) -> tuple[Union["ExecuteStatementResponse", "GetStatementResponse"], dict]:
+        """Poll a submitted statement with exponential backoff until it leaves the PENDING/RUNNING states.
+
+        The statement is cancelled if it does not finish within ``poll_timeout`` seconds, unless ``cancel_on_timeout`` is unset.
+        """
+        from databricks.sdk.service.sql import StatementState
+
+        statement_id = result.statement_id
+        start = time.monotonic()
+        deadline = start + poll_timeout
+        poll_count = 0
+
+        delays = backoff_delays(consts.POLL_INITIAL_DELAY, consts.POLL_MAX_DELAY)
+        while result.status is None or result.status.state in (StatementState.PENDING, StatementState.RUNNING):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                if not cancel_on_timeout:
+                    raise TimeoutError(consts.PERFORM_QUERY_ATTACHED_POLL_TIMEOUT_ERROR_MESSAGE.format(statement_id, poll_timeout))
+                self.save_progress(f"Cancelling statement {statement_id}")
+                api_client.statement_execution.cancel_execution(statement_id)
+                raise TimeoutError(consts.PERFORM_QUERY_POLL_TIMEOUT_ERROR_MESSAGE.format(statement_id, poll_timeout))
+
+            time.sleep(min(next(delays), remaining))
+            result = api_client.statement_execution.get_statement(statement_id)
+            poll_count += 1
+            self.debug_print(f"Statement {statement_id} is {result.status.state if result.status else None} after {poll_count} polls")
+
+        return result, {
+            "statement_id": statement_id,
+            "poll_count": poll_count,
+            "wait_seconds": round(time.monotonic() - start, 3),
+        }
+
+    @staticmethod
+    def _has_result(result: Union["ExecuteStatementResponse", "GetStatementResponse"]) -> bool:
+        from databricks.sdk.service.sql import StatementState
+
+        return result.status is not None and result.status.state == StatementState.SUCCEEDED and result.result is not None
+
+    def _download_external_link(self, link: "ExternalLink") -> bytes:
+        # Presigned links must not carry the Databricks credentials, only the headers they come with
+        response = requests.get(link.external_link, headers=link.http_headers, timeout=consts.EXTERNAL_LINK_DOWNLOAD_TIMEOUT)
+        response.raise_for_status()
+        return response.content
+
+    def _iter_result_chunks(
+        self,
+        api_client: "WorkspaceClient",
+        statement_id: str,
+        result_format: "Format",
+        chunk: Optional["ResultData"],
+        decode_arrow: bool = False,
+    ) -> Iterator[tuple]:
+        """Yield ``(rows, byte_count, external_link)`` for every chunk of a statement result, one chunk at a time.
+
+        JSON_ARRAY rows behind external links are downloaded and parsed as they are reached, and so are
+        ARROW_STREAM rows if ``decode_arrow`` is set. Otherwise the links are only passed on.
+        """
+        from databricks.sdk.service.sql import Format
+
+        while chunk is not None:
+            if chunk.external_links:
+                for link in chunk.external_links:
+                    if result_format == Format.JSON_ARRAY:
+                        content = self._download_external_link(link)
+                        yield json.loads(content), len(content), None
+                    elif result_format == Format.ARROW_STREAM and decode_arrow:
+                        content = self._download_external_link(link)
+                        yield decode_arrow_stream(content), len(content), None
+                    else:
+                        yield [], link.byte_count or 0, link
+                next_chunk_index = chunk.external_links[-1].next_chunk_index
+            else:
+                rows = chunk.data_array or []
+                byte_count = chunk.byte_count if chunk.byte_count is not None else len(json.dumps(rows))
+                yield rows, byte_count, None
+                next_chunk_index = chunk.next_chunk_index
+
+            if next_chunk_index is None:
+                return
+
+            chunk = api_client.statement_execution.get_statement_result_chunk_n(statement_id, next_chunk_index)
+
+    def _fetch_all_chunks(
+        self,
+        api_client: "WorkspaceClient",
+        result: Union["ExecuteStatementResponse", "GetStatementResponse"],
+        response: dict,
+        max_rows: int,
+        max_bytes: int,
+        decode_arrow: bool = False,
+    ):
+        from databricks.sdk.service.sql import Format
+
+        result_format = result.manifest.format if result.manifest else Format.JSON_ARRAY
+
+        if result_format == Format.ARROW_STREAM and decode_arrow and not arrow_available():
+            self.save_progress(consts.ARROW_UNAVAILABLE_MESSAGE)
+            decode_arrow = False
+
+        # The first chunk is already part of the response, rows are re-added as the chunks stream in
+        response_result = response.setdefault("result", {})
+        data_array = response_result["data_array"] = []
+        external_links = []
+
+        rows_fetched = 0
+        bytes_fetched = 0
+        chunks_fetched = 0
+        truncated = False
+
+        chunks = self._iter_result_chunks(api_client, result.statement_id, result_format, result.result, decode_arrow)
+        for rows, byte_count, link in chunks:
+            if rows_fetched >= max_rows or bytes_fetched + byte_count > max_bytes:
+                truncated = True
+                break
+
+            chunks_fetched += 1
+            bytes_fetched += byte_count
+
+            if link is not None:
+                external_links.append(link.as_dict())
+                continue
+
+            remaining = max_rows - rows_fetched
+            if len(rows) > remaining:
+                rows = rows[:remaining]
+                truncated = True
+            data_array.extend(rows)
+            rows_fetched += len(rows)
+
+            if truncated:
+                break
+
+        if external_links:
+            response_result["external_links"] = external_links
+        else:
+            response_result.pop("external_links", None)
+        response_result["row_count"] = rows_fetched
 
         summary = {
-            "status": consts.PERFORM_QUERY_SUCCESS_MESSAGE,
+            "rows_fetched": rows_fetched,
+            "bytes_fetched": bytes_fetched,
+            "chunks_fetched": chunks_fetched,
+            "truncated": truncated,
         }
-        action_result.update_summary(summary)
+        if result_format == Format.ARROW_STREAM:
+            summary["arrow_decoded"] = decode_arrow
+        return summary
+
+    def _retry_on_resolved_warehouses(
+        self,
+        statement_requests: list[dict],
+        results: list[tuple],
+        warehouse_names_by_id: dict[str, str],
+        execute: Callable,
+        max_concurrency: int,
+    ):
+        """Run statements that failed on a warehouse given by name once more, if the name resolves to a new warehouse now.
+
+        The cached ID of a name outlives its warehouse when the warehouse is deleted or recreated under the
+        same name. ``results`` is updated in place.
+        """
+        stale = [
+            index
+            for index, (data, (_, error)) in enumerate(zip(statement_requests, results))
+            if error is not None and self._is_not_found(error) and data["warehouse_id"] in warehouse_names_by_id
+        ]
+        if not stale:
+            return
+
+        fresh_ids = {}
+        for warehouse_id in {statement_requests[index]["warehouse_id"] for index in stale}:
+            name = warehouse_names_by_id[warehouse_id]
+            if not self._metadata_cache.invalidate(consts.METADATA_KIND_WAREHOUSE, name):
+                continue
+            try:
+                fresh_ids[warehouse_id] = self._resolve_warehouse_name(name)
+            except Exception as e:
+                self.debug_print(f"Failed to resolve the warehouse named {name} again. {self._get_error_msg_from_exception(e)}")
+
+        retry = [index for index in stale if statement_requests[index]["warehouse_id"] in fresh_ids]
+        for index in retry:
+            statement_requests[index]["warehouse_id"] = fresh_ids[statement_requests[index]["warehouse_id"]]
+        for index, result in zip(retry, run_concurrently(execute, [statement_requests[index] for index in retry], max_concurrency)):
+            results[index] = result
+
+    def _execute_and_wait(self, api_client: "WorkspaceClient", data: dict, poll_timeout: int) -> dict:
+        from databricks.sdk.service.sql import StatementState
+
+        start = time.monotonic()
+        result = api_client.statement_execution.execute_statement(wait_timeout="0s", **data)
+        result, _ = self._wait_for_statement(api_client, result, poll_timeout)
+
+        response = result.as_dict()
+        response["elapsed_seconds"] = round(time.monotonic() - start, 3)
+        if result.status.state != StatementState.SUCCEEDED:
+            error = result.status.error.message if result.status.error else None
+            response["error"] = consts.PERFORM_QUERY_STATEMENT_FAILED_ERROR_MESSAGE.format(result.statement_id, result.status.state.value, error)
+        return response
+
+    @_ACTIONS.register(
+        "perform_batch_query",
+        timeout=consts.PERFORM_QUERY_DEFAULT_POLL_TIMEOUT,
+        max_concurrency=consts.PERFORM_BATCH_QUERY_DEFAULT_MAX_CONCURRENCY,
+    )
+    def _handle_perform_batch_query(self, param):
+        self.debug_print(f"In action handler for: {self.get_action_identifier()}")
+
+        action_result = self.add_action_result(ActionResult(dict(param)))
+
+        if "parameter_sets" in param:
+            # One statement template run once per parameter set, every set is checked before anything is submitted
+            try:
+                parameter_sets = json.loads(param["parameter_sets"])
+            except ValueError as e:
+                return self._report_error(action_result, e, consts.PERFORM_BATCH_QUERY_INVALID_PARAMETER_SETS_ERROR_MESSAGE)
+            if not isinstance(parameter_sets, list) or not parameter_sets or "statement_template" not in param:
+                return action_result.set_status(phantom.APP_ERROR, consts.PERFORM_BATCH_QUERY_INVALID_PARAMETER_SETS_ERROR_MESSAGE)
+
+            statement_parameters = []
+            for index, values in enumerate(parameter_sets):
+                try:
+                    statement_parameters.append(bind_parameters(param["statement_template"], values))
+                except ValueError as e:
+                    return self._report_error(action_result, e, consts.PERFORM_BATCH_QUERY_INVALID_PARAMETER_SET_ERROR_MESSAGE.format(index))
+            statements = [param["statement_template"]] * len(parameter_sets)
+        else:
+            try:
+                statements = json.loads(param.get("statements", ""))
+            except ValueError as e:
+                return self._report_error(action_result, e, consts.PERFORM_BATCH_QUERY_INVALID_STATEMENTS_ERROR_MESSAGE)
+
+            if not isinstance(statements, list) or not statements or not all(isinstance(statement, str) for statement in statements):
+                return action_result.set_status(phantom.APP_ERROR, consts.PERFORM_BATCH_QUERY_INVALID_STATEMENTS_ERROR_MESSAGE)
+            statement_parameters = [None] * len(statements)
+
+        warehouse_ids = parse_warehouse_ids(param.get("warehouse_ids", ""))
+        warehouse_names = [name.strip() for name in param.get("warehouse_names", "").split(",") if name.strip()]
+        warehouse_names_by_id = {}
+        try:
+            for name in warehouse_names:
+                warehouse_id = self._resolve_warehouse_name(name)
+                warehouse_names_by_id[warehouse_id] = name
+                warehouse_ids.append(warehouse_id)
+        except Exception as e:
+            return self._report_error(action_result, e, consts.PERFORM_BATCH_QUERY_ERROR_MESSAGE)
+        if not warehouse_ids:
+            return action_result.set_status(phantom.APP_ERROR, consts.PERFORM_BATCH_QUERY_INVALID_WAREHOUSES_ERROR_MESSAGE)
 
+        from databricks.sdk.service.sql import Disposition, Format
+
+        common = {"format": Format.JSON_ARRAY, "disposition": Disposition.INLINE}
+        self._set_key_if_param_defined(common, param, "byte_limit")
+        self._set_key_if_param_defined(common, param, "catalog")
+        self._set_key_if_param_defined(common, param, "schema")
+
+        # Statements are spread over the given warehouses round-robin
+        statement_requests = []
+        for index, (statement, parameters) in enumerate(zip(statements, statement_parameters)):
+            data = dict(common, statement=statement, warehouse_id=warehouse_ids[index % len(warehouse_ids)])
+            if parameters is not None:
+                data["parameters"] = self._get_statement_parameters(parameters)
+            statement_requests.append(data)
+
+        poll_timeout = int(param.get("poll_timeout", self._action_handler.timeout))
+        max_concurrency = int(param.get("max_concurrency", self._action_handler.max_concurrency))
+
+        start = time.monotonic()
+        try:
+            api_client = self._get_api_client()
+        except Exception as e:
+            return self._report_error(action_result, e, consts.PERFORM_BATCH_QUERY_ERROR_MESSAGE)
+
+        def execute(data):
+            return self._execute_and_wait(api_client, data, poll_timeout)
+
+        results = run_concurrently(execute, statement_requests, max_concurrency)
+        self._retry_on_resolved_warehouses(statement_requests, results, warehouse_names_by_id, execute, max_concurrency)
+
+        failed_statements = 0
+        for index, (data, (response, error)) in enumerate(zip(statement_requests, results)):
+            if error is not None:
+                response = {"error": self._get_error_msg_from_exception(error)}
+
+            if "error" in response:
+                failed_statements += 1
+
+            response["index"] = index
+            response["statement"] = data["statement"]
+            response["warehouse_id"] = data["warehouse_id"]
+            if statement_parameters[index] is not None:
+                response["parameters"] = statement_parameters[index]
+            action_result.add_data(response)
+
+        summary = {
+            "status": consts.PERFORM_BATCH_QUERY_SUCCESS_MESSAGE,
+            "total_statements": len(statements),
+            "failed_statements": failed_statements,
+            "elapsed_seconds": round(time.monotonic() - start, 3),
+        }
+
+        if failed_statements == len(statements):
+            summary["status"] = consts.PERFORM_BATCH_QUERY_ERROR_MESSAGE
+            action_result.update_summary(summary)
+            return action_result.set_status(phantom.APP_ERROR, consts.PERFORM_BATCH_QUERY_ERROR_MESSAGE)
+
+        action_result.update_summary(summary)
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    @_ACTIONS.register("get_query_status")
     def _handle_get_query_status(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
@@ -307,6 +1360,7 @@ class DatabricksConnector(BaseConnector):
 
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    @_ACTIONS.register("cancel_query")
     def _handle_cancel_query(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
@@ -327,36 +1381,65 @@ class DatabricksConnector(BaseConnector):
 
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    @_ACTIONS.register("get_job_run", max_concurrency=consts.GET_JOB_RUN_DEFAULT_MAX_CONCURRENCY)
     def _handle_get_job_run(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
         action_result = self.add_action_result(ActionResult(dict(param)))
 
-        run_id = param["run_id"]
+        try:
+            run_ids = [int(run_id) for run_id in param.get("run_ids", "").split(",") if run_id.strip()]
+        except ValueError:
+            return action_result.set_status(phantom.APP_ERROR, consts.GET_JOB_RUN_INVALID_RUN_IDS_ERROR_MESSAGE)
+        if "run_id" in param:
+            run_ids.insert(0, int(param["run_id"]))
+        if not run_ids:
+            return action_result.set_status(phantom.APP_ERROR, consts.GET_JOB_RUN_INVALID_RUN_IDS_ERROR_MESSAGE)
+
+        # Keep the first occurrence of every run ID, playbooks often collect duplicates
+        run_ids = list(dict.fromkeys(run_ids))
+        fields = [field.strip() for field in param.get("fields", "").split(",") if field.strip()]
+        max_concurrency = int(param.get("max_concurrency", self._action_handler.max_concurrency))
+
+        try:
+            api_client = self._get_api_client()
+        except Exception as e:
+            return self._report_error(action_result, e, consts.GET_JOB_RUN_ERROR_MESSAGE)
+
+        runs = run_concurrently(api_client.jobs.get_run, run_ids, max_concurrency)
+
+        failed_runs = 0
+        last_error = None
+        for run_id, (run, error) in zip(run_ids, runs):
+            if error is not None:
+                failed_runs += 1
+                last_error = error
+                error_message = self._get_error_msg_from_exception(error)
+                self.save_progress(f"Failed to retrieve job run {run_id}. {error_message}")
+                action_result.add_data({"run_id": run_id, "error": error_message})
+                continue
+
+            data = run.as_dict()
+            if fields:
+                data = project_fields(data, ["run_id", *fields])
+            action_result.add_data(data)
 
-        ret_val, response = self._get_job_run(run_id, action_result)
-        action_result.add_data(response)
         summary = {
             "status": consts.GET_JOB_RUN_SUCCESS_MESSAGE,
+            "total_runs": len(run_ids),
+            "failed_runs": failed_runs,
         }
-        action_result.update_summary(summary)
-
-        if phantom.is_fail(ret_val):
-            return ret_val
-
-        return action_result.set_status(phantom.APP_SUCCESS)
 
-    def _get_job_run(self, run_id, action_result):
-        self.debug_print("Getting job run details")
+        if failed_runs == len(run_ids):
+            summary["status"] = consts.GET_JOB_RUN_ERROR_MESSAGE
+            action_result.update_summary(summary)
+            return self._report_error(action_result, last_error, consts.GET_JOB_RUN_ERROR_MESSAGE)
 
-        try:
-            api_client = self._get_api_client()
-            result = api_client.jobs.get_run(run_id)
-        except Exception as e:
-            return self._report_error(action_result, e, consts.GET_JOB_RUN_ERROR_MESSAGE)
+        action_result.update_summary(summary)
 
-        return action_result.set_status(phantom.APP_SUCCESS), result.as_dict()
+        return action_result.set_status(phantom.APP_SUCCESS)
 
+    @_ACTIONS.register("get_job_output", max_concurrency=consts.GET_JOB_OUTPUT_DEFAULT_MAX_CONCURRENCY)
     def _handle_get_job_output(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
@@ -364,6 +1447,10 @@ class DatabricksConnector(BaseConnector):
 
         run_id = param["run_id"]
 
+        export_format = param.get("export_format", EXPORT_FORMAT_NONE)
+        if export_format not in (EXPORT_FORMAT_NONE, EXPORT_FORMAT_NDJSON_GZ):
+            return action_result.set_status(phantom.APP_ERROR, consts.GET_JOB_OUTPUT_INVALID_EXPORT_FORMAT_ERROR_MESSAGE)
+
         try:
             api_client = self._get_api_client()
             job_run = api_client.jobs.get_run(run_id)
@@ -371,24 +1458,76 @@ class DatabricksConnector(BaseConnector):
             return self._report_error(action_result, e, consts.GET_JOB_RUN_ERROR_MESSAGE)
 
         if job_run.tasks is None:
-            return action_result.set_status(phantom.APP_ERROR, "This job run contains no task runs")
+            return action_result.set_status(phantom.APP_ERROR, consts.GET_JOB_OUTPUT_NO_TASKS_ERROR_MESSAGE)
+
+        task_runs = [task_run for task_run in job_run.tasks if task_run.run_id is not None]
+        max_concurrency = int(param.get("max_concurrency", self._action_handler.max_concurrency))
+
+        outputs = iter_concurrently(lambda task_run: api_client.jobs.get_run_output(task_run.run_id), task_runs, max_concurrency)
+
+        failed_tasks = 0
+
+        def task_outputs() -> Iterator[dict]:
+            nonlocal failed_tasks
+            for task_run, (task_output, error) in zip(task_runs, outputs):
+                if error is not None:
+                    failed_tasks += 1
+                    error_message = self._get_error_msg_from_exception(error)
+                    self.save_progress(f"Failed to retrieve output of task {task_run.task_key}. {error_message}")
+                    yield {"task_key": task_run.task_key, "run_id": task_run.run_id, "error": error_message}
+                    continue
+
+                data = task_output.as_dict()
+                data["task_key"] = task_run.task_key
+                yield data
 
-        for task_run in job_run.tasks:
-            if task_run.run_id is not None:
-                task_output = api_client.jobs.get_run_output(task_run.run_id)
-                action_result.add_data(task_output.as_dict())
         summary = {
             "status": consts.GET_JOB_OUTPUT_SUCCESS_MESSAGE,
         }
+
+        if export_format == EXPORT_FORMAT_NONE:
+            for data in task_outputs():
+                action_result.add_data(data)
+        else:
+            # Outputs are written as they arrive, so no more than max_concurrency of them are held in memory
+            file_name = f"databricks_run_{run_id}_output{EXPORT_FILE_EXTENSIONS[export_format]}"
+            preview_rows = int(param.get("preview_rows", consts.EXPORT_DEFAULT_PREVIEW_ROWS))
+
+            def write(exporter: ResultExporter):
+                for data in task_outputs():
+                    exporter.write_records([data])
+
+            try:
+                export = self._export_to_vault(export_format, file_name, None, preview_rows, write)
+            except Exception as e:
+                return self._report_error(action_result, e, consts.GET_JOB_OUTPUT_ERROR_MESSAGE)
+
+            export["preview"] = [project_fields(data, consts.GET_JOB_OUTPUT_PREVIEW_FIELDS) for data in export["preview"]]
+            action_result.add_data({"run_id": run_id, **export})
+            summary["vault_id"] = export["vault_id"]
+
+        summary["total_tasks"] = len(task_runs)
+        summary["failed_tasks"] = failed_tasks
+
+        if task_runs and failed_tasks == len(task_runs):
+            summary["status"] = consts.GET_JOB_OUTPUT_ERROR_MESSAGE
+            action_result.update_summary(summary)
+            return action_result.set_status(phantom.APP_ERROR, consts.GET_JOB_OUTPUT_ERROR_MESSAGE)
+
         action_result.update_summary(summary)
 
         return action_result.set_status(phantom.APP_SUCCESS)
 
+    @_ACTIONS.register("execute_notebook")
     def _handle_execute_notebook(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
         action_result = self.add_action_result(ActionResult(dict(param)))
 
+        from databricks.sdk.service.compute import ClusterSpec, Library
+        from databricks.sdk.service.iam import AccessControlRequest
+        from databricks.sdk.service.jobs import GitSource, NotebookTask, SubmitTask
+
         # Task key needs to be unique per parent job and can be used to set a dependency order
         # within a job. However, for the purposes of this action we always create a one time job
         # with a single task, so we can hardcode a readable value instead of exposing this
@@ -400,8 +1539,15 @@ class DatabricksConnector(BaseConnector):
         if "new_cluster" in param:
             cluster_json = json.loads(param["new_cluster"])
             task_info.new_cluster = ClusterSpec.from_dict(cluster_json)
+        cluster_name = None
         if "existing_cluster_id" in param:
             task_info.existing_cluster_id = param["existing_cluster_id"]
+        elif "existing_cluster_name" in param:
+            cluster_name = param["existing_cluster_name"]
+            try:
+                task_info.existing_cluster_id = self._resolve_cluster_name(cluster_name)
+            except Exception as e:
+                return self._report_error(action_result, e, consts.EXECUTE_NOTEBOOK_ERROR_MESSAGE)
         if "libraries" in param:
             libraries_json = json.loads(param["libraries"])
             task_info.libraries = [Library.from_dict(d) for d in libraries_json]
@@ -418,42 +1564,143 @@ class DatabricksConnector(BaseConnector):
         self._set_key_if_param_defined(run_info, param, "run_name")
         self._set_key_if_param_defined(run_info, param, "idempotency_token")
 
-        def callback(run: Run):
-            action_result.add_data(run.as_dict())
+        def callback(run: "Run"):
+            # Only called while the run is in progress, the final state is handled below
+            if run.state is not None and run.state.life_cycle_state is not None:
+                self.save_progress(f"Run {run.run_id} is {run.state.life_cycle_state.value}")
 
-            if run.state is None:
-                return action_result.set_status(action_result.set_status(phantom.APP_ERROR, "Failed to get execution status"))
+        try:
+            api_client = self._get_api_client()
 
-            if run.state.result_state == RunResultState.FAILED:
-                action_result.update_summary({"status": consts.EXECUTE_NOTEBOOK_ERROR_MESSAGE})
-                return action_result.set_status(phantom.APP_ERROR, run.state.state_message)
+            def submit(cluster_id: Optional[str]):
+                task_info.existing_cluster_id = cluster_id
+                return api_client.jobs.submit(**run_info)
 
-            action_result.update_summary({"status": consts.EXECUTE_NOTEBOOK_SUCCESS_MESSAGE})
-            return action_result.set_status(phantom.APP_SUCCESS)
+            with self._phase("submit"):
+                waiter = self._call_with_resolved_id(
+                    consts.METADATA_KIND_CLUSTER, cluster_name, task_info.existing_cluster_id, self._resolve_cluster_name, submit
+                )
+
+            if not param.get("wait_for_completion", True):
+                # Hand the run over to 'wait for run' instead of holding this action worker
+                action_result.add_data({"run_id": waiter.run_id})
+                action_result.update_summary({"status": consts.EXECUTE_NOTEBOOK_SUBMITTED_MESSAGE, "run_id": waiter.run_id})
+                return action_result.set_status(phantom.APP_SUCCESS)
+
+            with self._phase("wait"):
+                run = waiter.result(callback=callback)
+        except Exception as e:
+            return self._report_error(action_result, e, consts.EXECUTE_NOTEBOOK_ERROR_MESSAGE)
+
+        with self._phase("serialize"):
+            run_data = run.as_dict()
+        with self._phase("add_data"):
+            action_result.add_data(run_data)
+
+        if run.state is None:
+            return action_result.set_status(phantom.APP_ERROR, "Failed to get execution status")
+
+        if run.state.result_state is not None and run.state.result_state.value in FAILED_RUN_RESULT_STATES:
+            action_result.update_summary({"status": consts.EXECUTE_NOTEBOOK_ERROR_MESSAGE})
+            return action_result.set_status(phantom.APP_ERROR, run.state.state_message)
+
+        action_result.update_summary({"status": consts.EXECUTE_NOTEBOOK_SUCCESS_MESSAGE})
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    @_ACTIONS.register("wait_for_run", timeout=consts.WAIT_FOR_RUN_DEFAULT_TIMEOUT)
+    def _handle_wait_for_run(self, param):
+        self.debug_print(f"In action handler for: {self.get_action_identifier()}")
+
+        action_result = self.add_action_result(ActionResult(dict(param)))
+
+        run_id = param["run_id"]
+        timeout = int(param.get("timeout", self._action_handler.timeout))
+
+        start = time.monotonic()
+        deadline = start + timeout
+        delays = backoff_delays(consts.POLL_INITIAL_DELAY, consts.POLL_MAX_DELAY)
+        transitions = []
+        poll_count = 0
 
         try:
             api_client = self._get_api_client()
-            api_client.jobs.submit(**run_info).result(callback=callback)
+
+            from databricks.sdk.service.jobs import RunState
+
+            while True:
+                run = api_client.jobs.get_run(run_id)
+                poll_count += 1
+
+                state = run.state or RunState()
+                life_cycle_state = state.life_cycle_state.value if state.life_cycle_state else None
+                result_state = state.result_state.value if state.result_state else None
+
+                # Only record changes, a long running run would otherwise repeat the same state
+                if not transitions or (transitions[-1]["life_cycle_state"], transitions[-1]["result_state"]) != (life_cycle_state, result_state):
+                    transitions.append(
+                        {
+                            "life_cycle_state": life_cycle_state,
+                            "result_state": result_state,
+                            "state_message": state.state_message,
+                            "elapsed_seconds": round(time.monotonic() - start, 3),
+                        }
+                    )
+                    self.save_progress(f"Run {run_id} is {life_cycle_state}")
+
+                remaining = deadline - time.monotonic()
+                if life_cycle_state in TERMINAL_RUN_LIFE_CYCLE_STATES or remaining <= 0:
+                    break
+
+                time.sleep(min(next(delays), remaining))
         except Exception as e:
-            return self._report_error(action_result, e, consts.EXECUTE_NOTEBOOK_ERROR_MESSAGE)
+            return self._report_error(action_result, e, consts.WAIT_FOR_RUN_ERROR_MESSAGE)
+
+        data = run.as_dict()
+        data["state_transitions"] = transitions
+        action_result.add_data(data)
+
+        finished = life_cycle_state in TERMINAL_RUN_LIFE_CYCLE_STATES
+        action_result.update_summary(
+            {
+                "status": consts.WAIT_FOR_RUN_SUCCESS_MESSAGE if finished else consts.WAIT_FOR_RUN_ERROR_MESSAGE,
+                "life_cycle_state": life_cycle_state,
+                "result_state": result_state,
+                "poll_count": poll_count,
+                "wait_seconds": round(time.monotonic() - start, 3),
+            }
+        )
+
+        # The run keeps going on a timeout, it can be waited for again
+        if not finished:
+            return action_result.set_status(phantom.APP_ERROR, consts.WAIT_FOR_RUN_TIMEOUT_ERROR_MESSAGE.format(run_id, timeout))
+
+        if life_cycle_state == "INTERNAL_ERROR" or result_state in FAILED_RUN_RESULT_STATES:
+            return action_result.set_status(phantom.APP_ERROR, state.state_message)
 
+        return action_result.set_status(phantom.APP_SUCCESS)
+
+    @_ACTIONS.register("list_warehouses")
     def _handle_list_warehouses(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
         action_result = self.add_action_result(ActionResult(dict(param)))
 
+        total_warehouses = 0
         try:
             api_client = self._get_api_client()
-            result = api_client.warehouses.list()
+            warehouses = self._iter_listing(
+                api_client.warehouses.list(),
+                param,
+                get_name=lambda warehouse: warehouse.name,
+                get_state=lambda warehouse: warehouse.state,
+                get_creator=lambda warehouse: warehouse.creator_name,
+            )
+            for warehouse in warehouses:
+                action_result.add_data(warehouse)
+                total_warehouses += 1
         except Exception as e:
             return self._report_error(action_result, e, consts.LIST_WAREHOUSES_ERROR_MESSAGE)
 
-        total_warehouses = 0
-
-        for warehouse in result:
-            action_result.add_data(warehouse.as_dict())
-            total_warehouses += 1
-
         summary = {
             "status": consts.LIST_WAREHOUSES_SUCCESS_MESSAGE,
             "total warehouses": total_warehouses,
@@ -462,44 +1709,234 @@ class DatabricksConnector(BaseConnector):
         action_result.update_summary(summary)
         return action_result.set_status(phantom.APP_SUCCESS)
 
-    def _is_later_date(self, alert_triggered_date, last_triggered_date):
-        return datetime.strptime(alert_triggered_date, consts.DATETIME_FORMAT) > datetime.strptime(last_triggered_date, consts.DATETIME_FORMAT)
+    @staticmethod
+    def _to_epoch(date_string: str) -> int:
+        # Slicing the fixed-width timestamp is much cheaper than strptime, which
+        # is only used for values that do not match DATETIME_FORMAT exactly
+        if len(date_string) == 20 and date_string[4] == "-" and date_string[10] == "T" and date_string[19] == "Z":
+            try:
+                return calendar.timegm(
+                    (
+                        int(date_string[0:4]),
+                        int(date_string[5:7]),
+                        int(date_string[8:10]),
+                        int(date_string[11:13]),
+                        int(date_string[14:16]),
+                        int(date_string[17:19]),
+                    )
+                )
+            except ValueError:
+                pass
+
+        return calendar.timegm(datetime.strptime(date_string, consts.DATETIME_FORMAT).utctimetuple())
+
+    def _migrate_state(self):
+        """Bring state files written by older app versions up to the current layout.
 
+        Version 1 stored the ISO formatted trigger date of each alert, the current version stores
+        epoch seconds plus the latest trigger date seen across all alerts.
+        """
+        if self._state.get(consts.STATE_VERSION_KEY) == consts.STATE_VERSION:
+            return
+
+        state_alerts = {}
+        for alert_id, last_triggered_at in self._state.get(consts.STATE_ALERTS_KEY, {}).items():
+            try:
+                state_alerts[alert_id] = last_triggered_at if isinstance(last_triggered_at, int) else self._to_epoch(last_triggered_at)
+            except (TypeError, ValueError):
+                self.debug_print(f"Dropping unreadable state entry for alert {alert_id}")
+
+        self._state[consts.STATE_ALERTS_KEY] = state_alerts
+        self._state[consts.STATE_ALERTS_HIGH_WATER_MARK_KEY] = max(state_alerts.values(), default=0)
+        self._state[consts.STATE_VERSION_KEY] = consts.STATE_VERSION
+
+    def _create_alert_container(self, alert, max_artifacts: Optional[int], query_rows: Optional[list[dict]] = None) -> dict:
+        artifacts = [{"cef": alert.as_dict()}]
+        artifacts.extend({"name": consts.QUERY_RESULT_ARTIFACT_NAME, "cef": row} for row in query_rows or [])
+        if max_artifacts is not None:
+            artifacts = artifacts[:max_artifacts]
+
+        container = {}
+        container["name"] = alert.name if alert.name is not None else consts.DEFAULT_CONTAINER_NAME
+        container["artifacts"] = artifacts
+        return container
+
+    def _fetch_alert_query_rows(self, api_client: "WorkspaceClient", alert, warehouse_id: str, max_rows: int) -> list[dict]:
+        """Run the query behind an alert and return up to ``max_rows`` of its rows as typed records."""
+        from databricks.sdk.service.sql import Disposition, ExecuteStatementRequestOnWaitTimeout, Format, StatementState
+
+        statement = alert.query.query or api_client.queries.get(alert.query.id).query
+
+        # Alert queries are usually quick, waiting on the server saves the polls of an asynchronous submission
+        result = api_client.statement_execution.execute_statement(
+            statement=statement,
+            warehouse_id=warehouse_id,
+            format=Format.JSON_ARRAY,
+            disposition=Disposition.INLINE,
+            row_limit=max_rows,
+            wait_timeout=consts.POLL_QUERY_WAIT_TIMEOUT,
+            on_wait_timeout=ExecuteStatementRequestOnWaitTimeout.CONTINUE,
+        )
+        result, _ = self._wait_for_statement(api_client, result, consts.POLL_QUERY_TIMEOUT)
+        if result.status.state != StatementState.SUCCEEDED:
+            error = result.status.error.message if result.status.error else None
+            raise Exception(consts.PERFORM_QUERY_STATEMENT_FAILED_ERROR_MESSAGE.format(result.statement_id, result.status.state.value, error))
+
+        response = result.as_dict()
+        rows = response.get("result", {}).get("data_array", [])[:max_rows]
+        return decode_records(get_columns(response.get("manifest", {})), rows)
+
+    def _fetch_alert_query_results(self, api_client: "WorkspaceClient", alerts: list) -> list[Optional[list[dict]]]:
+        """Fetch the query rows of the given alerts through a bounded pool, None for alerts whose rows could not be fetched.
+
+        The warehouses behind the queries are resolved up front, the metadata cache is not shared between threads.
+        """
+        config = self.get_config()
+        default_warehouse_id = config.get("poll_query_warehouse_id")
+        max_rows = int(config.get("poll_query_max_rows", consts.POLL_QUERY_DEFAULT_MAX_ROWS))
+        max_concurrency = int(config.get("poll_query_max_concurrency", consts.POLL_QUERY_DEFAULT_MAX_CONCURRENCY))
+
+        warehouse_ids = []
+        for alert in alerts:
+            warehouse_id = default_warehouse_id
+            data_source_id = alert.query.data_source_id if alert.query else None
+            if data_source_id:
+                try:
+                    warehouse_id = self._resolve_data_source_warehouse(data_source_id)
+                except Exception as e:
+                    self.debug_print(f"Failed to resolve the warehouse of alert {alert.id}. {self._get_error_msg_from_exception(e)}")
+            warehouse_ids.append(warehouse_id)
+
+        def fetch(item):
+            alert, warehouse_id = item
+            if alert.query is None or warehouse_id is None:
+                raise ValueError(consts.POLL_QUERY_NO_WAREHOUSE_ERROR_MESSAGE.format(alert.id))
+            return self._fetch_alert_query_rows(api_client, alert, warehouse_id, max_rows)
+
+        query_rows = []
+        for alert, (rows, error) in zip(alerts, run_concurrently(fetch, zip(alerts, warehouse_ids), max_concurrency)):
+            if error is not None:
+                self.save_progress(f"Failed to fetch the query result of alert {alert.id}. {self._get_error_msg_from_exception(error)}")
+            query_rows.append(rows)
+
+        failed = query_rows.count(None)
+        self.save_progress(f"Fetched query results of {len(alerts) - failed} alerts, {failed} failed")
+        return query_rows
+
+    def _save_containers_in_batches(self, containers: list, batch_size: int) -> list[bool]:
+        """Ingest containers through the bulk save_containers call, ``batch_size`` at a time.
+
+        Returns whether each container was saved, in the order of ``containers``.
+        """
+        saved = []
+        for start in range(0, len(containers), batch_size):
+            batch = containers[start : start + batch_size]
+            ret_val, message, responses = self.save_containers(batch)
+            if phantom.is_fail(ret_val):
+                self.save_progress(f"Failed to save {len(batch)} containers. {message}")
+                saved.extend([False] * len(batch))
+                continue
+
+            for response in responses:
+                success = bool(response.get("success") or response.get("existing_container_id"))
+                if not success:
+                    self.debug_print("Failed to save container", response)
+                saved.append(success)
+
+        return saved
+
+    @_ACTIONS.register("on_poll")
     def _handle_on_poll(self, param):
         self.debug_print(f"In action handler for: {self.get_action_identifier()}")
 
+        max_containers = None
+        max_artifacts = None
         if self.is_poll_now():
             self.save_progress("Starting polling now")
             self.save_progress("Ignoring maximum number of containers and artifacts during poll now")
+        else:
+            max_containers = param.get(phantom.APP_JSON_CONTAINER_COUNT)
+            max_artifacts = param.get(phantom.APP_JSON_ARTIFACT_COUNT)
 
         action_result = self.add_action_result(ActionResult(dict(param)))
 
+        # Checked before anything is listed or run, a poll that cannot save its containers must not start
+        batch_size = int(self.get_config().get("container_batch_size", consts.DEFAULT_CONTAINER_BATCH_SIZE))
+        if batch_size < 1:
+            return action_result.set_status(phantom.APP_ERROR, consts.INVALID_CONTAINER_BATCH_SIZE_ERROR_MESSAGE)
+
         api_client = self._get_api_client()
         result = api_client.alerts.list()
 
         # get list of alerts from state to compare to current list of alerts
-        state_alerts = self._state.get("alerts", {})
+        state_alerts = self._state.get(consts.STATE_ALERTS_KEY, {})
+        high_water_mark = self._state.get(consts.STATE_ALERTS_HIGH_WATER_MARK_KEY, 0)
+        listed_alert_ids = set()
+        triggered_alerts = []
 
         for alert in result:
+            alert_id = alert.id
+            if not alert_id:
+                continue
+
+            listed_alert_ids.add(alert_id)
+
             last_triggered_at = alert.last_triggered_at
             if not last_triggered_at:
                 continue
 
-            alert_id = alert.id
+            triggered = self._to_epoch(last_triggered_at)
 
             # check to see if the latest alert trigger date is later than the last time it triggered
-            if alert_id:
-                if alert_id in state_alerts and not self._is_later_date(last_triggered_at, state_alerts[alert_id]):
+            previous_triggered = state_alerts.get(alert_id)
+            if previous_triggered is None:
+                # An alert we have not tracked yet whose trigger predates everything already
+                # ingested was triggered before the previous poll, so it is only tracked
+                if triggered < high_water_mark:
+                    state_alerts[alert_id] = triggered
                     continue
+            elif triggered <= previous_triggered:
+                continue
+
+            triggered_alerts.append((triggered, alert))
 
-                state_alerts[alert_id] = last_triggered_at
+        # Ingest the oldest triggers first, so alerts left over by the container limit
+        # are never older than the high-water mark and get picked up by the next poll
+        triggered_alerts.sort(key=lambda item: item[0])
+        if max_containers is not None:
+            triggered_alerts = triggered_alerts[: int(max_containers)]
+
+        # Rows of the alert queries are only fetched for alerts that get a container in this poll
+        query_rows = [None] * len(triggered_alerts)
+        if self.get_config().get("poll_fetch_query_results", False) and triggered_alerts:
+            query_rows = self._fetch_alert_query_results(api_client, [alert for _, alert in triggered_alerts])
+
+        containers = [self._create_alert_container(alert, max_artifacts, rows) for (_, alert), rows in zip(triggered_alerts, query_rows)]
+        saved = self._save_containers_in_batches(containers, batch_size)
+
+        # Only alerts whose container made it in advance the watermark. The high-water mark
+        # stops at the first failure so the failed alerts are not skipped by the next poll.
+        advance_high_water_mark = True
+        for (triggered, alert), container_saved in zip(triggered_alerts, saved):
+            if not container_saved:
+                advance_high_water_mark = False
+                continue
 
-                container = {}
-                container["name"] = alert.name if alert.name is not None else "Databricks Alert"
-                container["artifacts"] = [{"cef": alert.as_dict()}]
-                self.save_container(container)
+            state_alerts[alert.id] = triggered
+            if advance_high_water_mark:
+                high_water_mark = max(high_water_mark, triggered)
 
-                self._state["alerts"] = state_alerts
+        # alerts deleted outside of the app no longer need to be tracked
+        for alert_id in set(state_alerts) - listed_alert_ids:
+            del state_alerts[alert_id]
+
+        self._state[consts.STATE_ALERTS_KEY] = state_alerts
+        self._state[consts.STATE_ALERTS_HIGH_WATER_MARK_KEY] = high_water_mark
+
+        failed_containers = saved.count(False)
+        self.save_progress(f"Saved {len(saved) - failed_containers} containers, {failed_containers} failed")
+        if failed_containers:
+            return action_result.set_status(phantom.APP_ERROR, f"Failed to save {failed_containers} containers")
 
         return action_result.set_status(phantom.APP_SUCCESS)
 
@@ -509,41 +1946,73 @@ class DatabricksConnector(BaseConnector):
 
         self.debug_print("action_id", self.get_action_identifier())
 
+        first_result = len(self.get_action_results())
+        request_stats = _REQUEST_SCHEDULER.stats()
+
+        if self._instrumentation_enabled:
+            ret_val = self._handle_instrumented_action(action_id, param)
+        else:
+            ret_val = self._dispatch_action(action_id, param)
+
+        # Counts are kept for the whole process, report the difference this action made
+        request_stats = {name: count - request_stats.get(name, 0) for name, count in _REQUEST_SCHEDULER.stats().items()}
+        summary = {
+            "throttled_requests": request_stats.get("throttled_requests", 0),
+            "retried_requests": request_stats.get("retried_requests", 0),
+        }
+        for action_result in self.get_action_results()[first_result:]:
+            action_result.update_summary(summary)
+
+        return ret_val
+
+    def _handle_instrumented_action(self, action_id, param):
+        first_result = len(self.get_action_results())
+
+        self._instrumentation = instrumentation.ActionInstrumentation(consts.INSTRUMENTATION_MAX_REQUESTS)
+        instrumentation.activate(self._instrumentation)
         try:
-            if action_id == "test_connectivity":
-                ret_val = self._handle_test_connectivity(param)
-            elif action_id == "list_alerts":
-                ret_val = self._handle_list_alerts(param)
-            elif action_id == "list_clusters":
-                ret_val = self._handle_list_clusters(param)
-            elif action_id == "create_alert":
-                ret_val = self._handle_create_alert(param)
-            elif action_id == "delete_alert":
-                ret_val = self._handle_delete_alert(param)
-            elif action_id == "get_job_run":
-                ret_val = self._handle_get_job_run(param)
-            elif action_id == "get_job_output":
-                ret_val = self._handle_get_job_output(param)
-            elif action_id == "perform_query":
-                ret_val = self._handle_perform_query(param)
-            elif action_id == "get_query_status":
-                ret_val = self._handle_get_query_status(param)
-            elif action_id == "cancel_query":
-                ret_val = self._handle_cancel_query(param)
-            elif action_id == "execute_notebook":
-                ret_val = self._handle_execute_notebook(param)
-            elif action_id == "list_warehouses":
-                ret_val = self._handle_list_warehouses(param)
-            elif action_id == "on_poll":
-                ret_val = self._handle_on_poll(param)
-            else:
-                action_result = self.add_action_result(ActionResult(dict(param)))
-                ret_val = action_result.set_status(
-                    phantom.APP_ERROR,
-                    consts.UNHANDLED_ACTION_ID_ERROR_MESSAGE.format(action_id),
-                )
+            ret_val = self._dispatch_action(action_id, param)
+        finally:
+            instrumentation.activate(None)
+            summary = self._instrumentation.summary()
+            self._instrumentation = None
+
+        self.debug_print(f"Instrumentation for {action_id}", summary)
+
+        for action_result in self.get_action_results()[first_result:]:
+            action_result.update_summary({"instrumentation": summary})
+
+        instrumentation.aggregate(self._state.setdefault(consts.STATE_INSTRUMENTATION_KEY, {}), action_id, summary)
+
+        return ret_val
+
+    def _dispatch_action(self, action_id, param):
+        handler = _ACTIONS.get(action_id)
+        if handler is None:
+            action_result = self.add_action_result(ActionResult(dict(param)))
+            return action_result.set_status(
+                phantom.APP_ERROR,
+                consts.UNHANDLED_ACTION_ID_ERROR_MESSAGE.format(action_id),
+            )
+
+        first_result = len(self.get_action_results())
+        raised = False
+        start = time.monotonic()
+
+        self._action_handler = handler
+        try:
+            ret_val = handler.func(self, param)
         except Exception as e:
-            ret_val = self._report_error(ActionResult(dict(param)), e, "Action failed")
+            raised = True
+            action_result = self.add_action_result(ActionResult(dict(param)))
+            ret_val = self._report_error(action_result, e, consts.ACTION_FAILED_ERROR_MESSAGE)
+        finally:
+            self._action_handler = None
+
+        seconds = time.monotonic() - start
+        succeeded = all(action_result.get_status() for action_result in self.get_action_results()[first_result:])
+        self.debug_print(f"Action {action_id} {'succeeded' if succeeded else 'failed'} in {seconds:.3f} seconds")
+        record_run(self._state.setdefault(consts.STATE_ACTION_STATS_KEY, {}), action_id, seconds, succeeded, raised)
 
         return ret_val
 
@@ -551,6 +2020,7 @@ class DatabricksConnector(BaseConnector):
         # Load the state in initialize, use it to store data
         # that needs to be accessed across actions
         self._state = self.load_state()
+        self._migrate_state()
 
         # get the asset config
         config = self.get_config()
@@ -559,6 +2029,12 @@ class DatabricksConnector(BaseConnector):
         self._username = config.get("username")
         self._password = config.get("password")
         self._token = config.get("token")
+        self._instrumentation_enabled = config.get("enable_instrumentation", False)
+        self._metadata_cache = MetadataCache(
+            self._state.setdefault(consts.STATE_METADATA_KEY, {}),
+            int(config.get("metadata_cache_ttl", consts.METADATA_CACHE_DEFAULT_TTL)),
+            consts.METADATA_CACHE_MAX_ENTRIES,
+        )
 
         if (self._username and self._password) or self._token:
             return phantom.APP_SUCCESS
@@ -566,6 +2042,10 @@ class DatabricksConnector(BaseConnector):
         return self.set_status(phantom.APP_ERROR, consts.MISSING_AUTHENTICATION_ERROR_MESSAGE)
 
     def finalize(self):
+        self.debug_print("API client cache", _API_CLIENT_CACHE.stats())
+        if self._metadata_cache is not None:
+            self.debug_print("Metadata cache", self._metadata_cache.stats())
+
         # Save the state, this data is saved across actions and app upgrades
         self.save_state(self._state)
         return phantom.APP_SUCCESS
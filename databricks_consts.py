@@ -16,6 +16,46 @@
 
 DATETIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
+STATE_VERSION_KEY = "state_version"
+STATE_VERSION = 2
+STATE_ALERTS_KEY = "alerts"
+STATE_ALERTS_HIGH_WATER_MARK_KEY = "alerts_high_water_mark"
+STATE_INSTRUMENTATION_KEY = "instrumentation"
+STATE_METADATA_KEY = "metadata"
+STATE_ACTION_STATS_KEY = "action_stats"
+STATE_WAREHOUSE_STATES_KEY = "warehouse_states"
+
+METADATA_CACHE_DEFAULT_TTL = 3600
+METADATA_CACHE_MAX_ENTRIES = 1000
+METADATA_KIND_FOLDER = "folder"
+METADATA_KIND_WAREHOUSE = "warehouse"
+METADATA_KIND_CLUSTER = "cluster"
+METADATA_KIND_DATA_SOURCE = "data source"
+METADATA_UNKNOWN_NAME_ERROR_MESSAGE = "No {} named '{}' exists"
+METADATA_AMBIGUOUS_NAME_ERROR_MESSAGE = "Several objects of type {} are named '{}', use the ID instead"
+MISSING_WAREHOUSE_ERROR_MESSAGE = "One of 'warehouse_id', 'warehouse_name', 'warehouse_ids' or 'warehouse_tag' must be specified"
+
+WAREHOUSE_STATE_CACHE_TTL = 10
+ROUTE_WAREHOUSE_NO_CANDIDATE_ERROR_MESSAGE = "None of the warehouses given by 'warehouse_ids' and 'warehouse_tag' can run a statement"
+
+INSTRUMENTATION_MAX_REQUESTS = 50
+
+# Widget of 'perform query' and 'get query status' results
+VIEW_MAX_ROWS = 500
+VIEW_MAX_COLUMNS = 100
+VIEW_MAX_CELL_LENGTH = 200
+VIEW_PAGE_LENGTH = 25
+
+DEFAULT_CONTAINER_BATCH_SIZE = 100
+DEFAULT_CONTAINER_NAME = "Databricks Alert"
+QUERY_RESULT_ARTIFACT_NAME = "Alert query result row"
+POLL_QUERY_DEFAULT_MAX_ROWS = 100
+POLL_QUERY_DEFAULT_MAX_CONCURRENCY = 4
+POLL_QUERY_WAIT_TIMEOUT = "30s"
+POLL_QUERY_TIMEOUT = 120
+POLL_QUERY_NO_WAREHOUSE_ERROR_MESSAGE = "No warehouse found for the query of alert {}, set 'poll_query_warehouse_id' in the asset configuration"
+INVALID_CONTAINER_BATCH_SIZE_ERROR_MESSAGE = "'container_batch_size' in the asset configuration must be at least 1"
+
 MISSING_AUTHENTICATION_ERROR_MESSAGE = "Either username/password or an authentication token must be specified in the app configuration"
 
 TEST_CONNECTIVITY_SUCCESS_MESSAGE = "Test connectivity passed"
@@ -33,17 +73,81 @@ LIST_CLUSTERS_SUCCESS_MESSAGE = "Successfully listed clusters"
 LIST_CLUSTERS_ERROR_MESSAGE = "List clusters failed"
 LIST_WAREHOUSES_SUCCESS_MESSAGE = "Successfully listed warehouses"
 LIST_WAREHOUSES_ERROR_MESSAGE = "List warehouses failed"
+LIST_INVALID_UPDATED_SINCE_ERROR_MESSAGE = "'updated_since' must be a timestamp in the format YYYY-MM-DDTHH:MM:SSZ"
 PERFORM_QUERY_SUCCESS_MESSAGE = "Successfully performed SQL query"
 PERFORM_QUERY_ERROR_MESSAGE = "Failed to perform SQL query"
+PERFORM_QUERY_DEFAULT_MAX_ROWS = 100000
+PERFORM_QUERY_DEFAULT_MAX_BYTES = 100 * 1024 * 1024
+EXTERNAL_LINK_DOWNLOAD_TIMEOUT = 60
+ARROW_UNAVAILABLE_MESSAGE = "pyarrow is not installed, returning ARROW_STREAM external links without decoding them"
+PERFORM_QUERY_DEFAULT_POLL_TIMEOUT = 600
+PERFORM_QUERY_POLL_TIMEOUT_ERROR_MESSAGE = "Statement {} did not complete within {} seconds and was cancelled"
+PERFORM_QUERY_ATTACHED_POLL_TIMEOUT_ERROR_MESSAGE = "Statement {} did not complete within {} seconds and was left running for its owner"
+PERFORM_QUERY_STATEMENT_FAILED_ERROR_MESSAGE = "Statement {} finished in state {}: {}"
+PERFORM_QUERY_INVALID_PARAMETERS_ERROR_MESSAGE = "Invalid statement parameters"
+PERFORM_BATCH_QUERY_SUCCESS_MESSAGE = "Successfully performed SQL queries"
+PERFORM_BATCH_QUERY_ERROR_MESSAGE = "Failed to perform SQL queries"
+PERFORM_BATCH_QUERY_INVALID_STATEMENTS_ERROR_MESSAGE = "'statements' must be a non-empty JSON list of SQL statements"
+PERFORM_BATCH_QUERY_INVALID_WAREHOUSES_ERROR_MESSAGE = "'warehouse_ids' or 'warehouse_names' must contain at least one warehouse"
+PERFORM_BATCH_QUERY_INVALID_PARAMETER_SETS_ERROR_MESSAGE = "'parameter_sets' must be a non-empty JSON list and needs a 'statement_template'"
+PERFORM_BATCH_QUERY_INVALID_PARAMETER_SET_ERROR_MESSAGE = "Invalid parameter set at index {}"
+PERFORM_BATCH_QUERY_DEFAULT_MAX_CONCURRENCY = 10
+TEMPLATE_CACHE_MAX_ENTRIES = 256
+PERFORM_QUERY_EXPORT_NO_RESULT_ERROR_MESSAGE = "Statement {} has no result to export, it is in state {}: {}"
+IN_FLIGHT_DIRECTORY = "in_flight"
+IN_FLIGHT_SUBMIT_TIMEOUT = 30
+IN_FLIGHT_CHECK_INTERVAL = 0.2
+IN_FLIGHT_SUBMIT_TIMEOUT_MESSAGE = "An identical statement was not submitted in time by another action, executing it separately"
+QUERY_CACHE_DIRECTORY = "query_cache"
+QUERY_CACHE_DEFAULT_TTL = 300
+QUERY_CACHE_MAX_ENTRIES = 256
+QUERY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+POLL_INITIAL_DELAY = 1
+POLL_MAX_DELAY = 30
+POLL_BACKOFF_FACTOR = 2
+
+# API family -> path fragments of its endpoints, and (requests per second, burst) per family
+REQUEST_API_FAMILIES = {
+    "statements": ("/sql/statements",),
+    "jobs": ("/jobs/",),
+    "alerts": ("/sql/alerts",),
+}
+REQUEST_DEFAULT_API_FAMILY = "default"
+REQUEST_RATE_LIMITS = {
+    "statements": (20, 40),
+    "jobs": (30, 60),
+    "alerts": (5, 10),
+    "default": (30, 60),
+}
+REQUEST_MAX_RETRIES = 5
+REQUEST_RETRY_INITIAL_DELAY = 1
+REQUEST_RETRY_MAX_DELAY = 30
 
 EXECUTE_NOTEBOOK_SUCCESS_MESSAGE = "Successfully executed notebook"
 EXECUTE_NOTEBOOK_ERROR_MESSAGE = "Failed to execute notebook"
+EXECUTE_NOTEBOOK_SUBMITTED_MESSAGE = "Successfully submitted notebook run"
+
+WAIT_FOR_RUN_SUCCESS_MESSAGE = "Job run finished"
+WAIT_FOR_RUN_ERROR_MESSAGE = "Failed to wait for job run"
+WAIT_FOR_RUN_TIMEOUT_ERROR_MESSAGE = "Job run {} did not finish within {} seconds"
+WAIT_FOR_RUN_DEFAULT_TIMEOUT = 600
 
 GET_JOB_RUN_SUCCESS_MESSAGE = "Successfully retrieved job run"
 GET_JOB_RUN_ERROR_MESSAGE = "Failed to retrieve job run"
+GET_JOB_RUN_INVALID_RUN_IDS_ERROR_MESSAGE = "Either 'run_id' or 'run_ids' must be given, 'run_ids' as a comma-separated list of numeric run IDs"
+GET_JOB_RUN_DEFAULT_MAX_CONCURRENCY = 8
 
 GET_JOB_OUTPUT_SUCCESS_MESSAGE = "Successfully retrieved job run output"
 GET_JOB_OUTPUT_ERROR_MESSAGE = "Failed to retrieve job run output"
+GET_JOB_OUTPUT_NO_TASKS_ERROR_MESSAGE = "This job run contains no task runs"
+GET_JOB_OUTPUT_DEFAULT_MAX_CONCURRENCY = 8
+GET_JOB_OUTPUT_INVALID_EXPORT_FORMAT_ERROR_MESSAGE = "Job run outputs can only be exported as NDJSON_GZ"
+# Task outputs can be large, exported ones are previewed through these fields only
+GET_JOB_OUTPUT_PREVIEW_FIELDS = ("task_key", "run_id", "metadata.run_id", "metadata.state", "notebook_output.truncated", "error")
+
+EXPORT_DEFAULT_PREVIEW_ROWS = 10
+VAULT_ADD_ERROR_MESSAGE = "Failed to add {} to the vault: {}"
 
 GET_QUERY_STATUS_SUCCESS_MESSAGE = "Successfully retrieved query status"
 GET_QUERY_STATUS_ERROR_MESSAGE = "Failed to retrieve query status"
@@ -54,3 +158,4 @@ CANCEL_QUERY_ERROR_MESSAGE = "Failed to submit query cancellation request"
 DATABRICKS_ERROR_MESSAGE_UNAVAILABLE = "Unavailable. Please check the asset configuration and|or the action parameters."
 
 UNHANDLED_ACTION_ID_ERROR_MESSAGE = "Action ID {} does not have a code handler."
+ACTION_FAILED_ERROR_MESSAGE = "Action failed"
@@ -0,0 +1,208 @@
+# File: databricks_export.py
+#
+# Copyright (c) 2024-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import gzip
+import json
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone
+from decimal import Decimal, InvalidOperation
+from typing import Optional, Union
+
+import databricks_results
+from databricks_results import arrow_available, column_names, decode_columns
+
+
+EXPORT_FORMAT_NONE = "NONE"
+EXPORT_FORMAT_NDJSON_GZ = "NDJSON_GZ"
+EXPORT_FORMAT_PARQUET = "PARQUET"
+
+EXPORT_FILE_EXTENSIONS = {
+    EXPORT_FORMAT_NDJSON_GZ: ".ndjson.gz",
+    EXPORT_FORMAT_PARQUET: ".parquet",
+}
+
+# Databricks type name -> pyarrow type factory of the Parquet column. DECIMAL and TIMESTAMP columns get
+# the parametrized types built in _parquet_type, other types are written as strings, complex types
+# (ARRAY, MAP, STRUCT) as their JSON text.
+_PARQUET_TYPES = {
+    "BYTE": "int8",
+    "SHORT": "int16",
+    "INT": "int32",
+    "LONG": "int64",
+    "FLOAT": "float32",
+    "DOUBLE": "float64",
+    "BOOLEAN": "bool_",
+}
+_PARQUET_FLOAT_TYPES = ("FLOAT", "DOUBLE")
+
+
+def _parquet_type(column: dict):
+    pa = databricks_results.pa
+    type_name = column.get("type_name")
+    if type_name == "DECIMAL" and column.get("type_precision") is not None:
+        return pa.decimal128(column["type_precision"], column.get("type_scale") or 0)
+    if type_name == "TIMESTAMP":
+        return pa.timestamp("us", tz="UTC")
+    return getattr(pa, _PARQUET_TYPES.get(type_name, "string"))()
+
+
+def _to_float(value: str) -> Optional[float]:
+    # Decoders keep NaN, Infinity and unparseable values as strings, Parquet can store the former
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def _to_decimal(value: str) -> Optional[Decimal]:
+    try:
+        decimal = Decimal(value)
+    except InvalidOperation:
+        return None
+    return decimal if decimal.is_finite() else None
+
+
+def _to_datetime(value: Union[int, float, str]) -> Optional[datetime]:
+    # Decoders turn timestamps into epoch seconds and keep the ones they cannot read as strings
+    if isinstance(value, str):
+        return None
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+class ResultExporter(ABC):
+    """Writes a result to a file one chunk at a time and keeps the first rows as a preview.
+
+    Only the chunk being written is held in memory, so results of any size can be exported.
+    """
+
+    def __init__(self, path: str, columns: Optional[list[dict]], preview_rows: int):
+        self.path = path
+        self.columns = columns or []
+        self.preview_rows = preview_rows
+        self.preview: list[dict] = []
+        self.row_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write_rows(self, data_array: list[list]):
+        """Write JSON_ARRAY or decoded Arrow rows of a statement result, typed according to ``columns``."""
+        self.write_columns(decode_columns(self.columns, data_array))
+
+    def write_columns(self, columns: dict[str, list]):
+        names = list(columns)
+        self.write_records([dict(zip(names, row)) for row in zip(*columns.values())])
+
+    @abstractmethod
+    def write_records(self, records: list[dict]):
+        """Write rows already decoded into records keyed on column name."""
+
+    def _add_to_preview(self, columns: dict[str, list]):
+        missing = self.preview_rows - len(self.preview)
+        if missing > 0:
+            names = list(columns)
+            self.preview.extend(dict(zip(names, row)) for row in zip(*(values[:missing] for values in columns.values())))
+
+    @abstractmethod
+    def close(self):
+        """Finish the file, the exporter cannot be written to afterwards."""
+
+
+class NdjsonGzExporter(ResultExporter):
+    """One JSON object per line, gzip compressed."""
+
+    def __init__(self, path: str, columns: Optional[list[dict]], preview_rows: int):
+        super().__init__(path, columns, preview_rows)
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+
+    def write_records(self, records: list[dict]):
+        self._file.writelines(json.dumps(record, separators=(",", ":")) + "\n" for record in records)
+        missing = self.preview_rows - len(self.preview)
+        if missing > 0:
+            self.preview.extend(records[:missing])
+        self.row_count += len(records)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetExporter(ResultExporter):
+    """A Parquet file with one row group per written chunk. Needs pyarrow and the columns of the result."""
+
+    def __init__(self, path: str, columns: Optional[list[dict]], preview_rows: int):
+        super().__init__(path, columns, preview_rows)
+        import pyarrow.parquet
+
+        pa = databricks_results.pa
+        self._names = column_names(self.columns)
+        self._type_names = [column.get("type_name") for column in self.columns]
+        self._schema = pa.schema([(name, _parquet_type(column)) for name, column in zip(self._names, self.columns)])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema, compression="snappy")
+
+    @staticmethod
+    def _parquet_values(values: list, type_name: Optional[str], parquet_type) -> list:
+        if type_name in _PARQUET_FLOAT_TYPES:
+            return [_to_float(value) if isinstance(value, str) else value for value in values]
+        if databricks_results.pa.types.is_decimal(parquet_type):
+            # DECIMAL values stay exact strings when decoded
+            return [None if value is None else _to_decimal(value) for value in values]
+        if type_name == "TIMESTAMP":
+            return [None if value is None else _to_datetime(value) for value in values]
+        if type_name in _PARQUET_TYPES:
+            return [None if isinstance(value, str) else value for value in values]
+        return [value if value is None or isinstance(value, str) else json.dumps(value) for value in values]
+
+    def write_columns(self, columns: dict[str, list]):
+        pa = databricks_results.pa
+        arrays = [
+            pa.array(self._parquet_values(columns[name], type_name, field.type), type=field.type)
+            for name, type_name, field in zip(self._names, self._type_names, self._schema)
+        ]
+        table = pa.Table.from_arrays(arrays, schema=self._schema)
+        self._writer.write_table(table)
+
+        self._add_to_preview(columns)
+        self.row_count += table.num_rows
+
+    def write_records(self, records: list[dict]):
+        self.write_columns({name: [record.get(name) for record in records] for name in self._names})
+
+    def close(self):
+        self._writer.close()
+
+
+_EXPORTERS = {
+    EXPORT_FORMAT_NDJSON_GZ: NdjsonGzExporter,
+    EXPORT_FORMAT_PARQUET: ParquetExporter,
+}
+
+
+def check_export_format(export_format: str, arrow_stream: bool = False):
+    """Raise ValueError for unknown export formats, and for exports that need pyarrow where it is not installed.
+
+    Parquet files are always written with pyarrow, ARROW_STREAM results have to be decoded with it.
+    """
+    if export_format not in _EXPORTERS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    if (export_format == EXPORT_FORMAT_PARQUET or arrow_stream) and not arrow_available():
+        raise ValueError(f"pyarrow is not installed, this result cannot be exported as {export_format}")
+
+
+def open_exporter(export_format: str, path: str, columns: Optional[list[dict]], preview_rows: int) -> ResultExporter:
+    check_export_format(export_format)
+    return _EXPORTERS[export_format](path, columns, preview_rows)
@@ -0,0 +1,112 @@
+# File: databricks_instrumentation.py
+#
+# Copyright (c) 2024-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Optional
+from urllib.parse import urlparse
+
+
+_active_instrumentation: Optional["ActionInstrumentation"] = None
+
+
+class ActionInstrumentation:
+    """Collects the HTTP requests and the phase timings of a single action run."""
+
+    def __init__(self, max_requests: int):
+        self._lock = threading.Lock()
+        self._max_requests = max_requests
+        self._start = time.monotonic()
+        self.requests: list[dict] = []
+        self.request_count = 0
+        self.request_seconds = 0.0
+        self.response_bytes = 0
+        self.phases: dict[str, float] = defaultdict(float)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self.phases[name] += elapsed
+
+    def record_response(self, response):
+        # Content-Length is used instead of the body, reading a streamed download here would consume it
+        size = int(response.headers.get("Content-Length") or 0)
+        latency = response.elapsed.total_seconds()
+        record = {
+            "method": response.request.method,
+            "path": urlparse(response.url).path,
+            "status": response.status_code,
+            "latency_ms": round(latency * 1000, 1),
+            "bytes": size,
+        }
+
+        with self._lock:
+            self.request_count += 1
+            self.request_seconds += latency
+            self.response_bytes += size
+            if len(self.requests) < self._max_requests:
+                self.requests.append(record)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "total_seconds": round(time.monotonic() - self._start, 3),
+                "request_count": self.request_count,
+                "request_seconds": round(self.request_seconds, 3),
+                "response_bytes": self.response_bytes,
+                "phases": {name: round(seconds, 3) for name, seconds in self.phases.items()},
+                "requests": list(self.requests),
+            }
+
+
+def _response_hook(response, *args, **kwargs):
+    instrumentation = _active_instrumentation
+    if instrumentation is not None:
+        instrumentation.record_response(response)
+    return response
+
+
+def instrument_session(session):
+    """Report every response of a requests session to the active instrumentation, if any.
+
+    Sessions belong to cached API clients that outlive a single action, so the hook is
+    installed once and looks up the instrumentation of the running action on every call.
+    """
+    if _response_hook not in session.hooks["response"]:
+        session.hooks["response"].append(_response_hook)
+
+
+def activate(instrumentation: Optional[ActionInstrumentation]):
+    global _active_instrumentation
+    _active_instrumentation = instrumentation
+
+
+def aggregate(totals: dict, action_id: str, summary: dict) -> dict:
+    """Add the summary of one action run to the per-action totals kept in the state file."""
+    action_totals = totals.setdefault(action_id, {"runs": 0, "total_seconds": 0.0, "request_count": 0, "request_seconds": 0.0, "phases": {}})
+    action_totals["runs"] += 1
+    action_totals["total_seconds"] = round(action_totals["total_seconds"] + summary["total_seconds"], 3)
+    action_totals["request_count"] += summary["request_count"]
+    action_totals["request_seconds"] = round(action_totals["request_seconds"] + summary["request_seconds"], 3)
+    for name, seconds in summary["phases"].items():
+        action_totals["phases"][name] = round(action_totals["phases"].get(name, 0.0) + seconds, 3)
+    return totals
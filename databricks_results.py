@@ -0,0 +1,190 @@
+# File: databricks_results.py
+#
+# Copyright (c) 2024-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import base64
+import json
+import math
+import sys
+from datetime import datetime
+from typing import Any, Callable
+
+
+# pyarrow is optional, ARROW_STREAM results are only decoded where it is installed. It is imported
+# on first use, most actions never decode Arrow and should not pay for the import.
+pa = None
+pa_ipc = None
+
+
+RESULT_LAYOUT_RAW = "RAW"
+RESULT_LAYOUT_COLUMNS = "COLUMNS"
+RESULT_LAYOUT_RECORDS = "RECORDS"
+
+
+_ARROW_TIMESTAMP_UNITS = {"s": 1, "ms": 1e3, "us": 1e6, "ns": 1e9}
+
+
+def _to_bool(value: str) -> bool:
+    return value.lower() == "true"
+
+
+def _to_timestamp(value: str) -> Any:
+    # Epoch seconds; values fromisoformat cannot read are passed through unchanged
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return value
+
+
+def _to_json(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def _to_number(convert: Callable) -> Callable:
+    def decode(value: str) -> Any:
+        try:
+            number = convert(value)
+        except ValueError:
+            return value
+        # NaN and Infinity are not valid JSON, so they stay strings
+        return number if math.isfinite(number) else value
+
+    return decode
+
+
+_DECODERS = {
+    "BYTE": _to_number(int),
+    "SHORT": _to_number(int),
+    "INT": _to_number(int),
+    "LONG": _to_number(int),
+    "FLOAT": _to_number(float),
+    "DOUBLE": _to_number(float),
+    "BOOLEAN": _to_bool,
+    "TIMESTAMP": _to_timestamp,
+    "ARRAY": _to_json,
+    "MAP": _to_json,
+    "STRUCT": _to_json,
+}
+
+
+def get_columns(manifest: dict) -> list[dict]:
+    return manifest.get("schema", {}).get("columns", [])
+
+
+def column_names(columns: list[dict]) -> list[str]:
+    # Duplicate names (e.g. from joins) get their position appended so no column is lost
+    names = []
+    seen = set()
+    for position, column in enumerate(columns):
+        name = column.get("name") or str(position)
+        if name in seen:
+            name = f"{name}_{position}"
+        seen.add(name)
+        names.append(sys.intern(name))
+    return names
+
+
+def decode_columns(columns: list[dict], data_array: list[list]) -> dict[str, list]:
+    """Decode JSON_ARRAY rows into one typed value list per column.
+
+    Types without a dedicated decoder (strings, dates, binary, intervals) are kept as they are. So are
+    DECIMAL values, a float cannot hold every DECIMAL(38) value and IDs or amounts must stay exact.
+    """
+    names = column_names(columns)
+    if not data_array:
+        return {name: [] for name in names}
+
+    decoded = {}
+    for column, name, values in zip(columns, names, zip(*data_array)):
+        decoder = _DECODERS.get(column.get("type_name"))
+        if decoder is None:
+            decoded[name] = list(values)
+        else:
+            # Values decoded from Arrow are already typed, only strings need decoding
+            decoded[name] = [decoder(value) if isinstance(value, str) else value for value in values]
+
+    return decoded
+
+
+def decode_records(columns: list[dict], data_array: list[list]) -> list[dict]:
+    decoded = decode_columns(columns, data_array)
+    names = list(decoded)
+    return [dict(zip(names, row)) for row in zip(*decoded.values())]
+
+
+def apply_result_layout(response: dict, layout: str):
+    """Replace the raw ``data_array`` of a statement response with the requested typed layout, in place."""
+    if layout not in (RESULT_LAYOUT_RAW, RESULT_LAYOUT_COLUMNS, RESULT_LAYOUT_RECORDS):
+        raise ValueError(f"Unknown result layout: {layout}")
+
+    result = response.get("result")
+    if layout == RESULT_LAYOUT_RAW or not result or "data_array" not in result:
+        return
+
+    columns = get_columns(response.get("manifest", {}))
+    data_array = result.pop("data_array")
+
+    if layout == RESULT_LAYOUT_COLUMNS:
+        result["columns"] = decode_columns(columns, data_array)
+    else:
+        result["records"] = decode_records(columns, data_array)
+
+
+def arrow_available() -> bool:
+    global pa, pa_ipc
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.ipc
+        except ImportError:
+            return False
+        pa, pa_ipc = pyarrow, pyarrow.ipc
+    return True
+
+
+def _arrow_values(array) -> list:
+    """Convert an Arrow array into JSON serializable Python values."""
+    arrow_type = array.type
+
+    if pa.types.is_timestamp(arrow_type):
+        unit = _ARROW_TIMESTAMP_UNITS[arrow_type.unit]
+        return [None if value is None else value / unit for value in array.cast(pa.int64()).to_pylist()]
+    if pa.types.is_date(arrow_type) or pa.types.is_time(arrow_type):
+        return [None if value is None else value.isoformat() for value in array.to_pylist()]
+    if pa.types.is_floating(arrow_type):
+        return [value if value is None or math.isfinite(value) else str(value) for value in array.to_pylist()]
+    if pa.types.is_decimal(arrow_type):
+        # Exact decimal text, as in JSON_ARRAY results
+        return [None if value is None else format(value, "f") for value in array.to_pylist()]
+    if pa.types.is_binary(arrow_type) or pa.types.is_large_binary(arrow_type):
+        return [None if value is None else base64.b64encode(value).decode("ascii") for value in array.to_pylist()]
+
+    return array.to_pylist()
+
+
+def decode_arrow_stream(content: bytes) -> list[list]:
+    """Decode an Arrow IPC stream into rows, ``arrow_available`` has to be checked first.
+
+    The record batches are read straight from the downloaded bytes without copying them,
+    only the final Python values are materialized, one batch at a time.
+    """
+    rows = []
+    with pa_ipc.open_stream(pa.py_buffer(content)) as reader:
+        for batch in reader:
+            columns = [_arrow_values(column) for column in batch.columns]
+            rows.extend(list(row) for row in zip(*columns))
+    return rows
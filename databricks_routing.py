@@ -0,0 +1,81 @@
+# File: databricks_routing.py
+#
+# Copyright (c) 2024-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+from typing import Optional
+
+
+# Warehouse state -> preference, lower is better. Deleted warehouses and those in other states are never picked.
+_STATE_PREFERENCE = {
+    "RUNNING": 0,
+    "STARTING": 1,
+    "STOPPED": 2,
+    "STOPPING": 3,
+}
+
+STOPPED_STATES = ("STOPPED", "STOPPING")
+
+
+def warehouse_summary(warehouse) -> dict:
+    """The fields of a warehouse listing that routing decisions are based on, in a form that fits the state file."""
+    custom_tags = warehouse.tags.custom_tags if warehouse.tags and warehouse.tags.custom_tags else []
+    return {
+        "id": warehouse.id,
+        "name": warehouse.name,
+        "state": warehouse.state.value if warehouse.state else None,
+        "health": warehouse.health.status.value if warehouse.health and warehouse.health.status else None,
+        "num_clusters": warehouse.num_clusters or 0,
+        "max_num_clusters": warehouse.max_num_clusters or 1,
+        "num_active_sessions": warehouse.num_active_sessions or 0,
+        "tags": {tag.key: tag.value for tag in custom_tags},
+    }
+
+
+def parse_warehouse_ids(warehouse_ids: str) -> list[str]:
+    """Split a comma-separated list of warehouse IDs, skipping empty entries."""
+    return [warehouse_id.strip() for warehouse_id in warehouse_ids.split(",") if warehouse_id.strip()]
+
+
+def parse_tag(tag: str) -> tuple[str, Optional[str]]:
+    """Split a ``key=value`` tag filter. A bare ``key`` matches every value of the tag."""
+    key, separator, value = tag.partition("=")
+    return key.strip(), value.strip() if separator else None
+
+
+def has_tag(warehouse: dict, key: str, value: Optional[str]) -> bool:
+    return key in warehouse["tags"] and (value is None or warehouse["tags"][key] == value)
+
+
+def warehouse_load(warehouse: dict) -> float:
+    """Active sessions per running cluster. The API exposes no queue length, this is the closest measure of it."""
+    return warehouse["num_active_sessions"] / max(warehouse["num_clusters"], 1)
+
+
+def rank_warehouses(warehouses: list[dict]) -> list[dict]:
+    """Order candidate warehouses from best to worst, leaving out those that cannot run a statement.
+
+    Running warehouses come first, then starting and finally stopped ones. Within a state the least
+    loaded warehouse wins, ties go to the warehouse with the most room to scale out. Unhealthy
+    warehouses are only used when nothing else is left.
+    """
+    candidates = [warehouse for warehouse in warehouses if warehouse["state"] in _STATE_PREFERENCE]
+    return sorted(
+        candidates,
+        key=lambda warehouse: (
+            warehouse["health"] == "FAILED",
+            _STATE_PREFERENCE[warehouse["state"]],
+            warehouse_load(warehouse),
+            warehouse["num_clusters"] - warehouse["max_num_clusters"],
+        ),
+    )
@@ -0,0 +1,215 @@
+# File: databricks_scheduler.py
+#
+# Copyright (c) 2024-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import BaseAdapter
+
+import databricks_consts as consts
+
+
+# Throttled requests were rejected before being processed and can always be sent again
+THROTTLED_STATUSES = (429,)
+# A transient server error may come after the request took effect, so only requests without side effects are retried
+TRANSIENT_STATUSES = (500, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+# Errors the SDK retries by their message whatever the status and method, kept so they are still retried
+TRANSIENT_ERROR_MESSAGES = (
+    "com.databricks.backend.manager.util.UnknownWorkerEnvironmentException",
+    "does not have any associated worker environments",
+    "There is no worker environment with id",
+    "Unknown worker environment",
+    "ClusterNotReadyException",
+    "Unexpected error",
+    "Please try again later or try a faster operation.",
+    "RPC token bucket limit has been exceeded",
+)
+
+
+def backoff_delays(initial: float, maximum: float, factor: float = consts.POLL_BACKOFF_FACTOR) -> Iterator[float]:
+    """Yield exponentially growing delays, capped at ``maximum``, with up to half of each delay jittered away."""
+    delay = initial
+    while True:
+        yield delay / 2 + random.uniform(0, delay / 2)
+        delay = min(delay * factor, maximum)
+
+
+def api_family(path: str) -> str:
+    """Name of the rate limit group a REST API path belongs to."""
+    for family, prefixes in consts.REQUEST_API_FAMILIES.items():
+        if any(prefix in path for prefix in prefixes):
+            return family
+    return consts.REQUEST_DEFAULT_API_FAMILY
+
+
+def is_transient_error(response) -> bool:
+    """Whether a failed response carries one of the transient error messages."""
+    return not response.ok and any(message in response.text for message in TRANSIENT_ERROR_MESSAGES)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header, given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Allows ``rate`` requests per second on average, with bursts of up to ``burst`` requests."""
+
+    def __init__(self, rate: float, burst: int):
+        self._lock = threading.Lock()
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def acquire(self) -> bool:
+        """Take a token, waiting for one if the bucket is empty. Returns whether the caller had to wait."""
+        waited = False
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self._rate
+
+            waited = True
+            time.sleep(wait)
+
+
+class SingleAttemptClock:
+    """SDK clock that ends the SDK's own retry loop after the first attempt.
+
+    The SDK sleeps through its clock from inside the handler of the error it is about to retry, so
+    re-raising that error hands it to the caller unchanged. Retrying is left to the request scheduler.
+    """
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float):
+        error = sys.exc_info()[1]
+        if error is not None:
+            raise error
+        time.sleep(seconds)
+
+
+class RequestScheduler:
+    """Rate limits and retries the requests of every API client of the connector process.
+
+    Each API family gets its own token bucket, so a burst of statement polls cannot starve job or
+    alert requests. Throttled requests (429) are retried after the Retry-After delay. Transient
+    server errors (500/502/503/504) and connection errors are retried after a capped exponential
+    backoff with jitter, but only for idempotent requests. Errors with one of the transient messages
+    the SDK matches are retried for every request, like the SDK does. This is the only retry layer,
+    the SDK clients are built with a ``SingleAttemptClock``.
+    """
+
+    def __init__(self, limits: dict[str, tuple[float, int]], max_retries: int, initial_delay: float, max_delay: float):
+        self._buckets = {family: TokenBucket(rate, burst) for family, (rate, burst) in limits.items()}
+        self._max_retries = max_retries
+        self._initial_delay = initial_delay
+        self._max_delay = max_delay
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def install(self, session):
+        """Route every request of a requests session through the scheduler. Installing twice has no effect."""
+        for prefix, adapter in list(session.adapters.items()):
+            if not isinstance(adapter, _ScheduledAdapter):
+                session.mount(prefix, _ScheduledAdapter(adapter, self))
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def _count(self, name: str):
+        with self._lock:
+            self._counts[name] += 1
+
+    def send(self, adapter, request, **kwargs):
+        family = api_family(urlparse(request.url).path)
+        bucket = self._buckets.get(family, self._buckets[consts.REQUEST_DEFAULT_API_FAMILY])
+        delays = backoff_delays(self._initial_delay, self._max_delay)
+
+        attempt = 0
+        while True:
+            if bucket.acquire():
+                self._count("throttled_requests")
+
+            idempotent = request.method in IDEMPOTENT_METHODS
+            try:
+                response = adapter.send(request, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if not idempotent or attempt >= self._max_retries:
+                    raise
+                response = None
+
+            delay = next(delays)
+            if response is not None:
+                retryable = (
+                    response.status_code in THROTTLED_STATUSES
+                    or (response.status_code in TRANSIENT_STATUSES and idempotent)
+                    or is_transient_error(response)
+                )
+                if not retryable or attempt >= self._max_retries:
+                    return response
+
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after is not None:
+                    # Honour the server, within the same cap, plus jitter so waiting clients do not return in lockstep
+                    delay = min(retry_after, self._max_delay) + random.uniform(0, self._initial_delay)
+
+                response.close()
+
+            attempt += 1
+            self._count("retried_requests")
+            time.sleep(delay)
+
+
+class _ScheduledAdapter(BaseAdapter):
+    """Transport adapter that hands every request to the scheduler before the wrapped adapter sends it."""
+
+    def __init__(self, adapter, scheduler: RequestScheduler):
+        super().__init__()
+        self._adapter = adapter
+        self._scheduler = scheduler
+
+    def send(self, request, **kwargs):
+        return self._scheduler.send(self._adapter, request, **kwargs)
+
+    def close(self):
+        self._adapter.close()
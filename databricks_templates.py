@@ -0,0 +1,138 @@
+# File: databricks_templates.py
+#
+# Copyright (c) 2024-2025 Splunk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software distributed under
+# the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+# either express or implied. See the License for the specific language governing permissions
+# and limitations under the License.
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Union
+
+import databricks_consts as consts
+
+
+_MARKER_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+
+# Validated templates by the hash of their text, batches and repeated actions parse a template only once
+_template_cache: "OrderedDict[str, frozenset[str]]" = OrderedDict()
+_template_cache_lock = threading.Lock()
+
+
+def skip_quoted(template: str, start: int) -> int:
+    """Index right after the string literal or quoted identifier that starts at ``start``."""
+    quote = template[start]
+    index = start + 1
+    while index < len(template):
+        char = template[index]
+        if char == "\\" and quote != "`":
+            index += 2
+            continue
+        if char == quote:
+            return index + 1
+        index += 1
+    raise ValueError(f"Unterminated {quote} quote in statement template")
+
+
+def _parse_markers(template: str) -> frozenset[str]:
+    """Names of the ``:name`` parameter markers of a statement, ignoring quoted text, comments and ``::`` casts."""
+    markers = set()
+    index = 0
+    while index < len(template):
+        char = template[index]
+        if char in ("'", '"', "`"):
+            index = skip_quoted(template, index)
+        elif template.startswith("--", index):
+            end = template.find("\n", index)
+            index = len(template) if end < 0 else end + 1
+        elif template.startswith("/*", index):
+            end = template.find("*/", index + 2)
+            index = len(template) if end < 0 else end + 2
+        elif template.startswith("::", index):
+            index += 2
+        elif char == ":" and (match := _MARKER_NAME.match(template, index + 1)):
+            markers.add(match.group())
+            index = match.end()
+        else:
+            index += 1
+    return frozenset(markers)
+
+
+def template_markers(template: str) -> frozenset[str]:
+    key = hashlib.sha256(template.encode("utf-8")).hexdigest()
+    with _template_cache_lock:
+        markers = _template_cache.get(key)
+        if markers is not None:
+            _template_cache.move_to_end(key)
+            return markers
+
+    markers = _parse_markers(template)
+
+    with _template_cache_lock:
+        _template_cache[key] = markers
+        while len(_template_cache) > consts.TEMPLATE_CACHE_MAX_ENTRIES:
+            _template_cache.popitem(last=False)
+    return markers
+
+
+def _to_parameter(name: Any, value: Any, value_type: Any = None) -> dict:
+    if not isinstance(name, str) or not _MARKER_NAME.fullmatch(name):
+        raise ValueError(f"Invalid parameter name: {name!r}")
+
+    parameter = {"name": name}
+    # The API takes every value as a string, native JSON values keep their type through the parameter type
+    if isinstance(value, bool):
+        parameter["value"] = "true" if value else "false"
+        parameter["type"] = "BOOLEAN"
+    elif isinstance(value, int):
+        parameter["value"] = str(value)
+        parameter["type"] = "BIGINT"
+    elif isinstance(value, float):
+        parameter["value"] = repr(value)
+        parameter["type"] = "DOUBLE"
+    elif isinstance(value, str):
+        parameter["value"] = value
+    elif value is not None:
+        raise ValueError(f"Parameter {name} must be a string, number, boolean or null")
+
+    if value_type is not None:
+        parameter["type"] = value_type
+    return parameter
+
+
+def bind_parameters(template: str, values: Union[dict, list]) -> list[dict]:
+    """Check parameter values against the markers of a statement template and turn them into API parameters.
+
+    ``values`` maps marker names to values, or lists ``{"name": ..., "value": ..., "type": ...}`` objects for
+    values that need an explicit SQL type such as DATE. Every marker needs a value and every value a marker.
+    """
+    if isinstance(values, dict):
+        parameters = [_to_parameter(name, value) for name, value in values.items()]
+    elif isinstance(values, list) and all(isinstance(item, dict) for item in values):
+        parameters = [_to_parameter(item.get("name"), item.get("value"), item.get("type")) for item in values]
+    else:
+        raise ValueError("Parameters must be a JSON object of names and values or a list of name/value/type objects")
+
+    names = [parameter["name"] for parameter in parameters]
+    if len(set(names)) != len(names):
+        raise ValueError("Every parameter may only be given once")
+
+    markers = template_markers(template)
+    missing = markers - set(names)
+    if missing:
+        raise ValueError(f"No value given for parameters: {', '.join(sorted(missing))}")
+    unused = set(names) - markers
+    if unused:
+        raise ValueError(f"The statement has no markers for parameters: {', '.join(sorted(unused))}")
+
+    return parameters
@@ -14,6 +14,49 @@
 # and limitations under the License.
 
 
+import json
+from collections.abc import Iterator
+from itertools import islice
+
+import databricks_consts as consts
+
+
+def _iter_rows(result: dict) -> Iterator[list]:
+    # Results decoded by the 'result_layout' parameter are turned back into rows for display
+    if "records" in result:
+        return (list(record.values()) for record in result["records"])
+    if "columns" in result:
+        return (list(row) for row in zip(*result["columns"].values()))
+    return iter(result.get("data_array") or [])
+
+
+def _count_rows(result: dict) -> int:
+    if "records" in result:
+        return len(result["records"])
+    if "columns" in result:
+        return len(next(iter(result["columns"].values()), []))
+    return len(result.get("data_array") or [])
+
+
+def truncate_cell(value):
+    """Shorten long cell values, nested values are shown as their JSON text."""
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+
+    text = value if isinstance(value, str) else json.dumps(value)
+    if len(text) > consts.VIEW_MAX_CELL_LENGTH:
+        return text[: consts.VIEW_MAX_CELL_LENGTH] + "..."
+    return text
+
+
+def get_rows(result: dict, max_rows: int = consts.VIEW_MAX_ROWS, max_columns: int = consts.VIEW_MAX_COLUMNS) -> list[list]:
+    """The first ``max_rows`` rows and ``max_columns`` columns of a result, with long cells truncated.
+
+    Only the rendered window is copied, so the cost of rendering does not grow with the result.
+    """
+    return [[truncate_cell(cell) for cell in row[:max_columns]] for row in islice(_iter_rows(result), max_rows)]
+
+
 def get_ctx_result(result):
     ctx_result = {}
     param = result.get_param()
@@ -22,9 +65,29 @@ def get_ctx_result(result):
 
     ctx_result["param"] = param
 
-    if data:
-        ctx_result["headers"] = data[0].get("manifest", {}).get("schema", {}).get("columns", {})
-        ctx_result["data"] = data[0].get("result", {}).get("data_array", {})
+    if data and "vault_id" in data[0]:
+        # Exported results only carry a preview of their rows, the rest is in the vault file
+        ctx_result["export"] = {key: data[0].get(key) for key in ("vault_id", "file_name", "row_count")}
+        headers = data[0].get("schema", [])
+        rows = [list(record.values()) for record in data[0].get("preview", [])]
+        ctx_result["headers"] = headers[: consts.VIEW_MAX_COLUMNS]
+        ctx_result["data"] = get_rows({"data_array": rows})
+        ctx_result["total_rows"] = data[0].get("row_count", len(rows))
+        ctx_result["total_columns"] = len(headers)
+    elif data:
+        # Totals come from the manifest, counting the rows of a large result would cost as much as rendering them
+        manifest = data[0].get("manifest", {})
+        query_result = data[0].get("result", {})
+        headers = manifest.get("schema", {}).get("columns", [])
+        ctx_result["headers"] = headers[: consts.VIEW_MAX_COLUMNS]
+        ctx_result["data"] = get_rows(query_result)
+        ctx_result["total_rows"] = manifest.get("total_row_count", query_result.get("row_count", _count_rows(query_result)))
+        ctx_result["total_columns"] = manifest.get("schema", {}).get("column_count", len(headers))
+
+    if "data" in ctx_result:
+        ctx_result["shown_rows"] = shown_rows = len(ctx_result["data"])
+        ctx_result["shown_columns"] = shown_columns = len(ctx_result["headers"])
+        ctx_result["truncated"] = shown_rows < (ctx_result["total_rows"] or 0) or shown_columns < (ctx_result["total_columns"] or 0)
 
     if summary:
         ctx_result["summary"] = summary
@@ -34,6 +97,7 @@ def get_ctx_result(result):
 
 def display_query_results(provides, all_results, context):
     context["results"] = results = []
+    context["page_length"] = consts.VIEW_PAGE_LENGTH
 
     for summary, action_results in all_results:
         for result in action_results: